@@ -1,3 +1,10 @@
+import atexit
+import os
+import threading
+from contextlib import contextmanager
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import request_finished
 from django.db.backends.base.base import BaseDatabaseWrapper
 from pymongo import MongoClient
 
@@ -9,6 +16,120 @@ from django_mongodb.features import DatabaseFeatures
 from django_mongodb.introspection import DatabaseIntrospection
 from django_mongodb.operations import DatabaseOperations
 from django_mongodb.schema import DatabaseSchemaEditor
+from django_mongodb.utils import sanitize_client_opts
+
+# Process wide registry of MongoClients, keyed by the normalized client options.
+# Django creates one DatabaseWrapper per thread, a MongoClient however is thread-safe and
+# maintains its own connection pool, so all wrappers with the same settings share one client.
+_mongo_clients: dict[str, MongoClient] = {}
+_mongo_clients_lock = threading.Lock()
+_mongo_clients_pid = os.getpid()
+
+
+def _client_key(client_opts: dict) -> str:
+    return repr(sorted(client_opts.items(), key=lambda item: item[0]))
+
+
+def get_mongo_client(client_opts: dict) -> MongoClient:
+    """Return the shared MongoClient for the given client options, creating it if necessary."""
+    client_opts = sanitize_client_opts(dict(client_opts or {}))
+    key = _client_key(client_opts)
+    stale_clients = []
+    with _mongo_clients_lock:
+        if os.getpid() != _mongo_clients_pid:
+            # forked without passing the fork hook (e.g. multiprocessing with os.fork)
+            stale_clients = _reset_mongo_clients()
+        client = _mongo_clients.get(key)
+        if client is None:
+            client = _mongo_clients[key] = MongoClient(**client_opts)
+    for stale_client in stale_clients:
+        stale_client.close()
+    return client
+
+
+def close_mongo_clients():
+    """Close all shared MongoClients of the current process."""
+    with _mongo_clients_lock:
+        clients = list(_mongo_clients.values())
+        _mongo_clients.clear()
+    for client in clients:
+        client.close()
+
+
+def _reset_mongo_clients() -> list[MongoClient]:
+    # MongoClients are not fork-safe, the child drops the inherited clients and lazily creates
+    # new ones. Must be called with the lock held, returns the dropped clients to be closed.
+    global _mongo_clients_pid
+    clients = list(_mongo_clients.values())
+    _mongo_clients.clear()
+    _mongo_clients_pid = os.getpid()
+    return clients
+
+
+def _close_connections_after_fork():
+    # the DatabaseWrappers of the forking thread are inherited, they reconnect with a new client
+    from django.conf import settings
+
+    if not settings.configured:
+        return
+    from django.db import connections
+
+    for connection in connections.all(initialized_only=True):
+        if connection.vendor == "django_mongodb":
+            # the server session belongs to the parent, don't end it
+            connection.mongo_session = None
+            connection.close()
+            connection.mongo_client = None
+
+
+def _before_fork():
+    # hold the lock across the fork, so that the child never inherits it locked by another thread
+    _mongo_clients_lock.acquire()
+
+
+def _after_fork_in_parent():
+    _mongo_clients_lock.release()
+
+
+def _after_fork_in_child():
+    try:
+        clients = _reset_mongo_clients()
+    finally:
+        _mongo_clients_lock.release()
+    _close_connections_after_fork()
+    for client in clients:
+        client.close()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(
+        before=_before_fork,
+        after_in_parent=_after_fork_in_parent,
+        after_in_child=_after_fork_in_child,
+    )
+atexit.register(close_mongo_clients)
+
+SESSION_STRATEGIES = ("none", "per-connection", "per-request")
+
+# Number of explicit client sessions started / ended by all connections of this process
+session_counters = {"started": 0, "ended": 0}
+_session_counters_lock = threading.Lock()
+
+
+def _count_session(event: str):
+    with _session_counters_lock:
+        session_counters[event] += 1
+
+
+def _end_request_sessions(**kwargs):
+    from django.db import connections
+
+    for connection in connections.all(initialized_only=True):
+        if connection.vendor == "django_mongodb" and connection.session_strategy == "per-request":
+            connection.end_session()
+
+
+request_finished.connect(_end_request_sessions)
 
 
 class DatabaseWrapper(BaseDatabaseWrapper):
@@ -85,21 +206,60 @@ class DatabaseWrapper(BaseDatabaseWrapper):
         super().__init__(settings, *args, **kwargs)
         self.settings = settings
         self.mongo_client = None
+        self.mongo_session = None
+
+    @property
+    def session_strategy(self):
+        """
+        How cursors obtain a client session, configured with "SESSION_STRATEGY":
+        "none" uses pymongo's implicit sessions, "per-connection" reuses one session for the
+        lifetime of the connection and "per-request" one session until the request finishes
+        (or the enclosing `request_session()` block exits).
+        """
+        strategy = self.settings_dict.get("SESSION_STRATEGY", "none")
+        if strategy not in SESSION_STRATEGIES:
+            raise ImproperlyConfigured(
+                f"SESSION_STRATEGY must be one of {', '.join(SESSION_STRATEGIES)}, got {strategy!r}"
+            )
+        return strategy
+
+    def get_session(self):
+        if self.session_strategy == "none":
+            return None
+        if self.mongo_session is None:
+            self.mongo_session = self.mongo_client.start_session()
+            _count_session("started")
+        return self.mongo_session
+
+    def end_session(self):
+        session, self.mongo_session = self.mongo_session, None
+        if session is not None:
+            _count_session("ended")
+            session.end_session()
+
+    @contextmanager
+    def request_session(self):
+        """Scope the "per-request" session to a block, e.g. in tasks or management commands."""
+        try:
+            yield self
+        finally:
+            self.end_session()
 
     def get_connection_params(self):
         return self.settings_dict
 
     def get_new_connection(self, conn_params):
-        if not self.mongo_client:
-            self.mongo_client = MongoClient(**conn_params["CLIENT"])
+        self.mongo_client = get_mongo_client(conn_params["CLIENT"])
         name = conn_params.get("NAME") or "test"
+        if conn_params.get("CODEC_DECODING"):
+            return self.mongo_client.get_database(name, codec_options=self.ops.codec_options)
         return self.mongo_client[name]
 
     def get_database_version(self):
         return self.connection.server_info()["version"]
 
     def create_cursor(self, name=None):
-        return Cursor(self.mongo_client, self.connection)
+        return Cursor(self.mongo_client, self.connection, session=self.get_session())
 
     def is_usable(self):
         if self.connection is None:
@@ -111,8 +271,8 @@ class DatabaseWrapper(BaseDatabaseWrapper):
         return True
 
     def _close(self):
-        # nothing to do, MongoClient handles the connection pool
-        pass
+        # the shared MongoClient handles the connection pool and is closed at exit
+        self.end_session()
 
     def _set_autocommit(self, autocommit):
         pass
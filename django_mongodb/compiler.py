@@ -1,7 +1,19 @@
+from collections import defaultdict
 from functools import cached_property
 from itertools import chain
 
 from dictlib import dug
+from django.core.exceptions import FieldError, ValidationError
+from django.db.models import Count, DecimalField, FloatField, IntegerField
+from django.db.models.expressions import (
+    Col,
+    Combinable,
+    CombinedExpression,
+    Star,
+    Subquery,
+    Value,
+)
+from django.db.models.functions import Greatest, Least
 from django.db.models.sql.compiler import (
     SQLCompiler as BaseSQLCompiler,
 )
@@ -14,10 +26,14 @@ from django.db.models.sql.compiler import (
 from django.db.models.sql.constants import (
     CURSOR,
     GET_ITERATOR_CHUNK_SIZE,
+    LOUTER,
     MULTI,
     NO_RESULTS,
     SINGLE,
 )
+from django.db.models.sql.datastructures import Join
+from django.db.models.sql.query import Query
+from django.db.models.sql.where import AND, WhereNode
 
 try:
     from django.db.models.sql.constants import ROW_COUNT
@@ -26,27 +42,332 @@ except ImportError:
 
 from pymongo import InsertOne, UpdateOne
 
-from django_mongodb.query import MongoOrdering, MongoSelect, MongoWhereNode
+from django_mongodb.expressions import SearchScore
+from django_mongodb.pipeline_cache import Param, bind_params, get_pipeline_cache
+from django_mongodb.query import (
+    MongoOrdering,
+    MongoSelect,
+    MongoWhereNode,
+    expression_to_mongo,
+    has_text_search,
+)
+
+
+def _fuse_converters(converters, expression, connection):
+    if len(converters) == 1:
+        [converter] = converters
+        return lambda value: converter(value, expression, connection)
+
+    def convert(value):
+        for converter in converters:
+            value = converter(value, expression, connection)
+        return value
+
+    return convert
+
+
+def _flatten_where(node):
+    """Recursively yield the expressions of a filter, WhereNodes have no flatten()"""
+    if isinstance(node, WhereNode):
+        for child in node.children:
+            yield from _flatten_where(child)
+    elif hasattr(node, "flatten"):
+        yield from node.flatten()
+    else:
+        yield node
+
+
+# stages of simple pipelines, which can be executed with find, in the order find applies them
+FIND_STAGES = ("$match", "$sort", "$skip", "$limit", "$project")
+
+# fields, which are updated by $inc and $mul
+NUMERIC_FIELDS = (IntegerField, FloatField, DecimalField)
+
+# maximum number of keys of a semi-join, larger joins are looked up
+SEMI_JOIN_MAX_KEYS = 1000
 
 
 class SQLCompiler(BaseSQLCompiler):
     def __init__(self, query, connection, using, elide_empty=True):
         super().__init__(query, connection, using, elide_empty)
         self.extr = None
+        # number of parameter slots while compiling an operation template, otherwise None
+        self._template_params = None
+        # $lookup stages of the subqueries, and the let variables of outer query columns
+        self.subquery_stages = []
+        self.outer_refs = {}
+        # filters of the joined collections, which can be semi-joined, and their fetched keys
+        self.semi_join_filters = {}
+        self.semi_join_keys = {}
+        # exists() only checks for a matching document, it doesn't need the selected columns
+        self.exists_only = False
 
-    def build_mongo_filter(self, filter_expr):
-        referenced_tables = set()
-        for key, item in self.query.alias_refcount.items():
-            if item < 1:
-                continue
-            else:
-                referenced_tables.add(self.query.alias_map[key].table_name)
+    def param(self, value):
+        """Bind a query value, or a parameter slot when compiling an operation template."""
+        if self._template_params is None:
+            return value
+        self._template_params += 1
+        return Param(self._template_params - 1)
 
-        if len(referenced_tables) > 1:
+    def build_mongo_filter(self, filter_expr):
+        if self.get_joined_aliases(filter_expr):
             raise NotImplementedError("Multi-table joins are not implemented yet.")
 
         return MongoWhereNode(filter_expr, self.mongo_meta)
 
+    def get_joined_aliases(self, node):
+        """Aliases of the $lookup stages, the columns of the node are embedded by"""
+        join_paths, _ = self.mongo_joins
+        return {
+            join_paths[expr.alias][:-1]
+            for expr in _flatten_where(node)
+            if isinstance(expr, Col) and join_paths.get(expr.alias)
+        }
+
+    def has_queried_columns(self, node):
+        """Whether the node references columns of the queried collection (not joined ones)"""
+        join_paths, _ = self.mongo_joins
+        return any(
+            isinstance(expr, Col) and join_paths.get(expr.alias) == ""
+            for expr in _flatten_where(node)
+        )
+
+    def split_join_filter(self, where):
+        """
+        Split the filter into the conditions on the queried collection and the conditions on
+        the joined collections, keyed by the alias of their $lookup stage, or None if they are
+        applied after the $lookup stages (several or outer joined collections).
+        """
+        if not self.get_joined_aliases(where):
+            return where, {}
+        if where.connector != AND or where.negated:
+            return WhereNode(), {None: where}
+        _, joins = self.mongo_joins
+        children = []
+        join_children = defaultdict(list)
+        for child in where.children:
+            if not (aliases := self.get_joined_aliases(child)):
+                children.append(child)
+                continue
+            alias = aliases.pop() if len(aliases) == 1 else None
+            # filtering the lookup of an outer join would keep the unmatched rows, and conditions
+            # on the columns of both collections are matched on the joined documents
+            if alias is not None and (
+                joins[alias].join_type == LOUTER or self.has_queried_columns(child)
+            ):
+                alias = None
+            join_children[alias].append(child)
+        return WhereNode(children, AND), {
+            alias: WhereNode(nodes, AND) for alias, nodes in join_children.items()
+        }
+
+    def build_join_filter(self, alias, join_where):
+        """
+        Compile the filter on a joined collection for the sub-pipeline of its $lookup stage, or
+        (alias None) on the embedded documents after the $lookup stages.
+        """
+        join_paths, _ = self.mongo_joins
+        if alias is not None:
+            join_paths = {key: "" for key, path in join_paths.items() if path == f"{alias}."}
+        join_meta = {**self.mongo_meta, "search_fields": {}, "join_paths": join_paths}
+        return MongoWhereNode(join_where, join_meta).get_mongo_query(self, self.connection)
+
+    def can_semi_join(self, alias, mongo_where):
+        """
+        Whether the queried collection can be filtered by the keys of the matching joined
+        documents instead of a $lookup. This pays off if the queried collection is not filtered
+        itself, every document of it would be looked up otherwise, and the decision if the joined
+        collection is selective enough is made when the query is executed.
+        """
+        join_paths, joins = self.mongo_joins
+        join = joins[alias]
+        [(lhs_field, rhs_field)] = join.join_fields
+        return (
+            not mongo_where
+            and join.join_type != LOUTER
+            and join_paths[join.parent_alias] == ""
+            and (rhs_field.unique or rhs_field.primary_key)
+            and "." not in rhs_field.column
+            # the joined documents are neither selected nor joined further
+            and not any(
+                join_paths.get(col.alias) == f"{alias}."
+                for col, _, _ in self.select
+                if isinstance(col, Col)
+            )
+            and not any(join_paths[other.parent_alias] == f"{alias}." for other in joins.values())
+        )
+
+    def build_join_filters(self, join_where, mongo_where):
+        """
+        Compile the filters on joined collections, keyed by the alias of their $lookup stage.
+        Return them together with the filters of the semi-joined collections, which filter the
+        queried collection by the fetched keys of the matching joined documents instead.
+        """
+        join_filters = {}
+        semi_join_filters = {}
+        for alias, where in join_where.items():
+            join_filter = self.build_join_filter(alias, where)
+            if alias is not None and self.can_semi_join(alias, mongo_where):
+                self.semi_join_filters[alias] = join_filter
+                if (keys := self.semi_join_keys.get(alias)) is not None:
+                    [(lhs_field, _)] = self.mongo_joins[1][alias].join_fields
+                    semi_join_filters[alias] = {lhs_field.column: {"$in": keys}}
+                    continue
+            join_filters[alias] = join_filter
+        return join_filters, semi_join_filters
+
+    def fetch_semi_join_keys(self):
+        """
+        Fetch the keys of the joined documents matching the semi-join filters, the collections
+        with more than SEMI_JOIN_MAX_KEYS matching documents are looked up. Return whether any
+        collection can be semi-joined.
+        """
+        for alias, join_filter in self.semi_join_filters.items():
+            if (keys := self.get_semi_join_keys(alias, join_filter)) is not None:
+                self.semi_join_keys[alias] = keys
+        return bool(self.semi_join_keys)
+
+    def get_semi_join_keys(self, alias, join_filter):
+        """
+        Keys of the joined documents matching the filter, None if there are more than
+        SEMI_JOIN_MAX_KEYS of them.
+        """
+        join = self.mongo_joins[1][alias]
+        [(_, rhs_field)] = join.join_fields
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                {
+                    "collection": join.table_name,
+                    "op": "find",
+                    "filter": join_filter,
+                    "projection": {rhs_field.column: 1},
+                    "limit": SEMI_JOIN_MAX_KEYS + 1,
+                }
+            )
+            documents = cursor.fetchmany(SEMI_JOIN_MAX_KEYS + 1)
+        if len(documents) > SEMI_JOIN_MAX_KEYS:
+            return None
+        keys = {document.get(rhs_field.column) for document in documents}
+        return [key for key in keys if key is not None]
+
+    @cached_property
+    def mongo_joins(self):
+        """
+        Path prefix of the referenced table aliases in the documents, and the joins embedded by
+        $lookup stages, keyed by alias. Joins on the same document (same collection
+        inheritance, OneToOne relationships on the primary key) are not looked up.
+        """
+        paths = {}
+        joins = {}
+        for alias, table in self.query.alias_map.items():
+            if not self.query.alias_refcount[alias]:
+                continue
+            if not isinstance(table, Join):
+                paths[alias] = ""
+                continue
+            if table.filtered_relation is not None or len(table.join_fields) != 1:
+                raise NotImplementedError(f"Join not implemented: {table.table_name}")
+            [(lhs_field, rhs_field)] = table.join_fields
+            parent_path = paths[table.parent_alias]
+            parent_table = self.query.alias_map[table.parent_alias].table_name
+            if table.table_name == parent_table and lhs_field.column == rhs_field.column:
+                paths[alias] = parent_path
+                continue
+            paths[alias] = f"{alias}."
+            joins[alias] = table
+        return paths, joins
+
+    def get_join_stages(self, join_filters=None, semi_joins=()):
+        """
+        $lookup stages embedding the joined collections, joined documents are filtered by the
+        sub-pipeline of their join filter. Semi-joined collections are not looked up.
+        """
+        join_paths, joins = self.mongo_joins
+        stages = []
+        for alias, join in joins.items():
+            if alias in semi_joins:
+                continue
+            [(lhs_field, rhs_field)] = join.join_fields
+            lookup = {
+                "from": join.table_name,
+                "localField": f"{join_paths[join.parent_alias]}{lhs_field.column}",
+                "foreignField": rhs_field.column,
+                "as": alias,
+            }
+            if join_filter := (join_filters or {}).get(alias):
+                lookup["pipeline"] = [{"$match": join_filter}]
+            stages.append({"$lookup": lookup})
+            stages.append(
+                {
+                    "$unwind": {
+                        "path": f"${alias}",
+                        "preserveNullAndEmptyArrays": join.join_type == LOUTER,
+                    }
+                }
+            )
+        return stages
+
+    def get_column_path(self, col: Col):
+        """Path of the column in the documents of the pipeline"""
+        join_paths, _ = self.mongo_joins
+        return f"{join_paths.get(col.alias, '')}{col.target.column}"
+
+    def get_column_ref(self, col: Col):
+        """Expression of the column, columns of the outer query are bound to let variables"""
+        if col.alias in self.query.alias_map:
+            return f"${self.get_column_path(col)}"
+        for var, outer_col in self.outer_refs.items():
+            if outer_col == col:
+                return f"$${var}"
+        var = f"outer_{len(self.outer_refs)}"
+        self.outer_refs[var] = col
+        return f"$${var}"
+
+    def add_subquery(self, query):
+        """
+        Look up the rows of the subquery into a field of the documents, correlated by the let
+        variables of its outer references. Return the field and the key of the first column.
+        """
+        compiler = query.get_compiler(connection=self.connection)
+        operation = compiler.as_operation()
+        field = f"__subquery_{len(self.subquery_stages)}"
+        lookup = {"from": operation["collection"], "pipeline": operation["pipeline"], "as": field}
+        if compiler.outer_refs:
+            lookup["let"] = {
+                var: self.get_column_ref(col) for var, col in compiler.outer_refs.items()
+            }
+        self.subquery_stages.append({"$lookup": lookup})
+        [col, _, alias] = compiler.select[0]
+        return field, compiler.get_column_key(col, alias)
+
+    def split_subquery_filter(self, where):
+        """
+        Split the filter into the conditions without and with subqueries, the latter are
+        matched after the $lookup stages of their subqueries.
+        """
+
+        def has_subquery(node):
+            return any(isinstance(expr, Query | Subquery) for expr in _flatten_where(node))
+
+        if not has_subquery(where):
+            return where, None
+        if where.connector != AND or where.negated:
+            return WhereNode(), where
+        return (
+            WhereNode([child for child in where.children if not has_subquery(child)], AND),
+            WhereNode([child for child in where.children if has_subquery(child)], AND),
+        )
+
+    def get_column_key(self, col: Col, alias: str | None):
+        """Key of the selected column in the result rows"""
+        if alias:
+            return alias
+        join_paths, _ = self.mongo_joins
+        if join_paths.get(col.alias):
+            # columns of joined collections are flattened into the row
+            return f"{col.alias}__{col.target.attname}"
+        return col.target.attname
+
     def get_distinct_clause(self):
         return [
             {
@@ -59,12 +380,12 @@ class SQLCompiler(BaseSQLCompiler):
             {"$replaceRoot": {"newRoot": "$_id"}},
         ]
 
-    def as_operation(self, with_limits=True, with_col_aliases=False):  # noqa: C901
+    def as_operation(self, with_limits=True, with_col_aliases=False):
         combinator = self.query.combinator
         extra_select, order_by, group_by = self.pre_sql_setup(
             with_col_aliases=with_col_aliases or bool(combinator),
         )
-        if combinator or extra_select or group_by or with_col_aliases:
+        if combinator or extra_select or with_col_aliases:
             raise NotImplementedError
 
         # Is a LIMIT/OFFSET clause needed?
@@ -72,40 +393,259 @@ class SQLCompiler(BaseSQLCompiler):
         if self.query.select_for_update:
             raise NotImplementedError
 
-        pipeline = []
-        mongo_where = self.build_mongo_filter(self.query.where)
+        where, subquery_where = self.split_subquery_filter(
+            self.where if self.where is not None else WhereNode()
+        )
+        where, join_where = self.split_join_filter(where)
+        mongo_where = self.build_mongo_filter(where)
         build_search_pipeline = (
-            (hasattr(self.query, "prefer_search") and self.query.prefer_search)
-            or mongo_where.requires_search()
-        ) and not self.query.distinct  # search not supported / efficient for distinct queries
+            (
+                (hasattr(self.query, "prefer_search") and self.query.prefer_search)
+                or mongo_where.requires_search()
+            )
+            and not self.query.distinct  # search not supported / efficient for distinct queries
+            # models with a local text index are searched by a $text query of the $match stage
+            and self.mongo_meta["text_search_vector"] is None
+        )
+
+        if group_by or join_where or subquery_where:
+            return self.build_operation(
+                mongo_where,
+                extra_select,
+                with_limit_offset,
+                build_search_pipeline,
+                group_by=self.get_mongo_group_by() if group_by else None,
+                join_where=join_where,
+                subquery_where=subquery_where,
+            )
 
+        cache = get_pipeline_cache(self.connection)
+        key = None
+        if cache is not None and not build_search_pipeline:
+            key = self.get_shape_key(mongo_where, extra_select, with_limit_offset)
+        if key is None:
+            return self.build_operation(
+                mongo_where, extra_select, with_limit_offset, build_search_pipeline
+            )
+
+        params = mongo_where.get_params(self.connection)
+        template = cache.get(key)
+        if template is None:
+            self._template_params = 0
+            try:
+                template = self.build_operation(
+                    mongo_where, extra_select, with_limit_offset, build_search_pipeline
+                )
+                param_count = self._template_params
+            finally:
+                self._template_params = None
+            if param_count != len(params):
+                # the shape does not describe all parameters, don't cache the template
+                return self.build_operation(
+                    mongo_where, extra_select, with_limit_offset, build_search_pipeline
+                )
+            cache.set(key, template)
+        return bind_params(template, params)
+
+    def get_shape_key(self, mongo_where, extra_select, with_limit_offset):
+        """
+        Return the shape of the query, which determines its operation up to the parameter
+        values, or None if the query can't be cached.
+        """
+        if (where_shape := mongo_where.get_shape()) is None:
+            return None
+        if not all(isinstance(field, str) for field in self.query.order_by):
+            return None
+        try:
+            select_shape = MongoSelect(self.select + extra_select, self.mongo_meta).get_shape()
+        except NotImplementedError:
+            return None
+        return (
+            self.query.model,
+            where_shape,
+            tuple(self.query.order_by),
+            self.query.distinct,
+            self.query.subquery,
+            (self.query.low_mark, self.query.high_mark) if with_limit_offset else None,
+            select_shape,
+            repr(self.get_join_stages()),
+            repr(getattr(self.query, "aggregation_stages", None)),
+            self.exists_only,
+            getattr(self.query, "estimated_count", False),
+            getattr(self.query, "with_total", False),
+        )
+
+    def get_count_alias(self, select_cols):
+        """Alias of the only selected column, if it counts all rows (count()), otherwise None"""
+        if len(select_cols) != 1:
+            return None
+        [(col, _, alias)] = select_cols
+        if type(col) is not Count or col.distinct or col.filter:
+            return None
+        source = col.get_source_expressions()[0]
+        if isinstance(source, Star) or (isinstance(source, Col) and source.target.primary_key):
+            return alias
+        return None
+
+    def has_results(self):
+        self.exists_only = True
+        return bool(self.execute_sql(SINGLE))
+
+    def can_return_stored_source(self, extra_select, extra_match):
+        """
+        Whether the search can return the documents from the stored source of the search index,
+        instead of looking them up in the collection, i.e. all selected columns, the columns
+        rechecked after the search and the sort keys are stored.
+        """
+        if not getattr(self.query, "search_stored_source", False):
+            return False
+        stored_fields = self.mongo_meta["search_stored_fields"]
+        cols = [col for col, _, _ in self.select + extra_select]
+        if extra_match:
+            cols.extend(_flatten_where(self.query.where))
+        stored_names = {"pk", *self.query.annotation_select}
+        stored_names.update(
+            field.name
+            for field in self.query.get_meta().concrete_fields
+            if field.primary_key or field.attname in stored_fields
+        )
+        if not all(
+            isinstance(name, str) and name.removeprefix("-") in stored_names
+            for name in self.query.order_by
+        ):
+            return False
+        return all(
+            col.target.primary_key or col.target.attname in stored_fields
+            for col in cols
+            if isinstance(col, Col)
+        )
+
+    def check_search_score(self, pipeline, extra_select):
+        """The search score only exists in the results of a $search stage or a $text query"""
+        uses_score = getattr(self.query, "order_by_score", False) or any(
+            isinstance(col, SearchScore) for col, _, _ in self.select + extra_select
+        )
+        if (
+            uses_score
+            and not any("$search" in stage for stage in pipeline)
+            and not has_text_search(pipeline)
+        ):
+            raise NotImplementedError(
+                "The search score requires a filter, which is searched by the $search stage "
+                "(or a $text query)."
+            )
+
+    def get_mongo_group_by(self):
+        if self.query.group_by is True:
+            group_by = [col for col, _, _ in self.select if not col.contains_aggregate]
+        else:
+            group_by = list(self.query.group_by)
+        if not all(isinstance(col, Col) for col in group_by):
+            raise NotImplementedError("Grouping is only implemented for columns.")
+        return group_by
+
+    def build_mongo_having(self):
+        if self.having is None:
+            return None
+        having_meta = {
+            **self.mongo_meta,
+            "search_fields": {},
+            # the having clause applies to the projected rows of the $group stage
+            "grouped": True,
+            "annotations": self.query.annotation_select,
+        }
+        return MongoWhereNode(self.having, having_meta)
+
+    def build_operation(  # noqa: C901
+        self,
+        mongo_where,
+        extra_select,
+        with_limit_offset,
+        build_search_pipeline,
+        group_by=None,
+        join_where=None,
+        subquery_where=None,
+    ):
+        self.subquery_stages = []
+        self.outer_refs = {}
+        self.semi_join_filters = {}
+        join_filters, semi_join_filters = self.build_join_filters(join_where or {}, mongo_where)
+        join_stages = self.get_join_stages(join_filters, semi_joins=semi_join_filters)
+
+        pipeline = []
         self._extend_with_stage(pipeline, "prepend")
 
         has_attname_as_key = False
         if mongo_where and build_search_pipeline:
             search = mongo_where.get_mongo_search(self, self.connection)
-            order = MongoOrdering(self.query).get_mongo_order()
             if search:
                 pipeline.append({"$search": search})
-                if self.query.order_by:
-                    search["sort"] = {**order}
+                if self.query.order_by and not group_by:
+                    search["sort"] = MongoOrdering(self.query).get_mongo_search_sort()
             # we need to recheck fields, which did not have a search index
-            if extra_match := mongo_where.get_mongo_query(self, self.connection, is_search=True):
+            extra_match = mongo_where.get_mongo_query(self, self.connection, is_search=True)
+            if search and self.can_return_stored_source(extra_select, extra_match):
+                search["returnStoredSource"] = True
+            if extra_match:
                 pipeline.append({"$match": extra_match})
         elif mongo_where:
             pipeline.append(
                 {"$match": mongo_where.get_mongo_query(self, self.connection, is_search=False)}
             )
+        pipeline.extend({"$match": semi_join} for semi_join in semi_join_filters.values())
+        self.check_search_score(pipeline, extra_select)
+
+        # outer joins don't change the rows, they are looked up for the selected page only
+        outer_joins_only = all(
+            stage["$unwind"]["preserveNullAndEmptyArrays"]
+            for stage in join_stages
+            if "$unwind" in stage
+        )
+        join_after_page = outer_joins_only and not (
+            group_by or self.query.distinct or join_filters or subquery_where
+        )
+        if not join_after_page:
+            pipeline.extend(join_stages)
+        if post_join_filter := join_filters.get(None):
+            pipeline.append({"$match": post_join_filter})
+        if subquery_where:
+            join_paths, _ = self.mongo_joins
+            subquery_meta = {**self.mongo_meta, "search_fields": {}, "join_paths": join_paths}
+            subquery_filter = MongoWhereNode(subquery_where, subquery_meta).get_mongo_query(
+                self, self.connection
+            )
+            pipeline.extend(self.subquery_stages)
+            pipeline.append({"$match": subquery_filter})
 
         self._extend_with_stage(pipeline, "pre-sort")
 
+        if group_by:
+            has_attname_as_key = True
+            pipeline.extend(
+                MongoSelect(self.select + extra_select, self.mongo_meta).get_grouped_mongo(
+                    self, self.connection, group_by
+                )
+            )
+            if mongo_having := self.build_mongo_having():
+                pipeline.append({"$match": mongo_having.get_mongo_query(self, self.connection)})
+
         if self.query.distinct:
             has_attname_as_key = True
             pipeline.extend(self.get_distinct_clause())
 
-        if self.query.order_by and not build_search_pipeline:
+        # the stages of the page (and the outer joins of its rows) follow
+        page_start = len(pipeline)
+
+        # grouped rows are sorted after the $group stage, not by the search
+        if self.query.order_by and (group_by or not build_search_pipeline):
             order = MongoOrdering(self.query).get_mongo_order(attname_as_key=has_attname_as_key)
             pipeline.append({"$sort": order})
+        elif (
+            getattr(self.query, "order_by_score", False)
+            and self.mongo_meta["text_search_vector"] is not None
+        ):
+            # unlike $search, $text doesn't return the documents by relevance
+            pipeline.append({"$sort": {"score": {"$meta": "textScore"}}})
 
         if with_limit_offset and self.query.low_mark:
             pipeline.append({"$skip": self.query.low_mark})
@@ -113,20 +653,114 @@ class SQLCompiler(BaseSQLCompiler):
         if with_limit_offset and self.query.high_mark:
             pipeline.append({"$limit": self.query.high_mark - self.query.low_mark})
 
+        if join_after_page:
+            pipeline.extend(join_stages)
+
         self._extend_with_stage(pipeline, "append")
 
-        if (select_cols := self.select + extra_select) and not has_attname_as_key:
-            select_pipeline = MongoSelect(select_cols, self.mongo_meta).get_mongo()
-            pipeline.extend(select_pipeline)
+        count_alias = None
+        if self.exists_only and not has_attname_as_key:
+            pipeline.append({"$project": {"_id": 1}})
+        elif (select_cols := self.select + extra_select) and not has_attname_as_key:
+            if count_alias := self.get_count_alias(select_cols):
+                pipeline.append({"$count": count_alias})
+            else:
+                select_pipeline = MongoSelect(select_cols, self.mongo_meta).get_mongo(
+                    self, self.connection
+                )
+                pipeline.extend(select_pipeline)
 
+        collection = self.query.model._meta.db_table
+        # unfiltered counts are read from the collection metadata, if approximate counts are ok
+        if (
+            count_alias
+            and pipeline == [{"$count": count_alias}]
+            and getattr(self.query, "estimated_count", False)
+        ):
+            return {
+                "collection": collection,
+                "op": "estimated_document_count",
+                "alias": count_alias,
+            }
+        if getattr(self.query, "with_total", False):
+            return self.get_facet_operation(collection, pipeline, page_start)
+        # subqueries are looked up by their pipeline
+        if not self.query.subquery and (
+            find_operation := self.get_find_operation(collection, pipeline)
+        ):
+            return find_operation
         return {
-            "collection": self.query.model._meta.db_table,
+            "collection": collection,
             "op": "aggregate",
             "pipeline": [
                 *pipeline,
             ],
         }
 
+    def get_operation(self):
+        """Operation to execute, the keys of the semi-joined collections are fetched first."""
+        operation = self.as_operation()
+        if self.semi_join_filters and self.fetch_semi_join_keys():
+            # the matching joined documents are few, filter the queried collection by their keys
+            operation = self.as_operation()
+        return operation
+
+    def get_facet_operation(self, collection, pipeline, page_start):
+        """
+        Return one aggregate of the page and the total number of rows: the shared stages, then
+        a $facet of the page stages and of the count. The rows of a search without further
+        stages are counted by the search ($$SEARCH_META), instead of passing them all.
+        """
+        prefix, rows = pipeline[:page_start], pipeline[page_start:]
+        if len(prefix) == 1 and "$search" in prefix[0]:
+            prefix = [{"$search": {**prefix[0]["$search"], "count": {"type": "total"}}}]
+            total = [
+                {"$replaceWith": "$$SEARCH_META"},
+                {"$limit": 1},
+                {"$project": {"total": "$count.total"}},
+            ]
+        else:
+            total = [{"$count": "total"}]
+        return {
+            "collection": collection,
+            "op": "aggregate",
+            "pipeline": [*prefix, {"$facet": {"rows": rows or [{"$match": {}}], "total": total}}],
+        }
+
+    def get_find_operation(self, collection, pipeline):
+        """
+        Return a find (or find_one) operation equivalent to the pipeline, if it only consists of
+        stages which find supports, in the order find applies them.
+        """
+        stages = {}
+        for stage in pipeline:
+            if len(stage) != 1:
+                return None
+            [(name, value)] = stage.items()
+            if name not in FIND_STAGES or any(
+                FIND_STAGES.index(name) <= FIND_STAGES.index(other) for other in stages
+            ):
+                return None
+            stages[name] = value
+        # find treats a limit of 0 as no limit
+        if stages.get("$limit") == 0:
+            return None
+
+        operation = {
+            "collection": collection,
+            "op": "find_one" if stages.get("$limit") == 1 else "find",
+            "filter": stages.get("$match", {}),
+        }
+        if "$project" in stages:
+            operation["projection"] = stages["$project"]
+        if "$sort" in stages:
+            operation["sort"] = list(stages["$sort"].items())
+        if "$skip" in stages:
+            operation["skip"] = stages["$skip"]
+        if "$limit" in stages and operation["op"] == "find":
+            operation["limit"] = stages["$limit"]
+        return operation
+
     def _extend_with_stage(self, pipeline, position):
         if not hasattr(self.query, "aggregation_stages"):
             return
@@ -140,10 +774,12 @@ class SQLCompiler(BaseSQLCompiler):
         if hasattr(self.query.model, "MongoMeta"):
             _meta = self.query.model.MongoMeta
             return {
-                "search_fields": {} if not hasattr(_meta, "search_fields") else _meta.search_fields
+                "search_fields": getattr(_meta, "search_fields", {}),
+                "search_stored_fields": getattr(_meta, "search_stored_fields", ()),
+                "text_search_vector": getattr(_meta, "text_search_vector", None),
             }
         else:
-            return {"search_fields": {}}
+            return {"search_fields": {}, "search_stored_fields": (), "text_search_vector": None}
 
     def execute_sql(
         self, result_type=MULTI, chunked_fetch=False, chunk_size=GET_ITERATOR_CHUNK_SIZE
@@ -156,20 +792,29 @@ class SQLCompiler(BaseSQLCompiler):
         if self.query.extra_tables:
             raise NotImplementedError("Can't do sub-queries with multiple tables yet.")
 
+        operation = self.get_operation()
+        if chunked_fetch:
+            operation["batch_size"] = chunk_size
         cursor = self.connection.cursor()
         try:
-            cursor.execute(self.as_operation())
+            cursor.execute(operation)
         except Exception:
             cursor.close()
             raise
 
         if result_type == CURSOR:
             return cursor
+        if result_type == MULTI and getattr(self.query, "with_total", False):
+            # the rows are returned as a single batch, the total is stored on the query
+            document = cursor.fetchone()
+            cursor.close()
+            self.query.total = document["total"][0]["total"] if document["total"] else 0
+            return [document["rows"]]
         if result_type == SINGLE:
             cols = list(self.select)
             result = cursor.fetchone()
             if result:
-                return (result.get(alias or col.target.attname) for col, _, alias in cols)
+                return (result.get(self.get_column_key(col, alias)) for col, _, alias in cols)
             return result
         if result_type == NO_RESULTS:
             cursor.close()
@@ -186,18 +831,28 @@ class SQLCompiler(BaseSQLCompiler):
         )
         return result
 
-    def apply_converters(self, rows, converters):
+    def get_converter_plan(self, converters):
+        """
+        Build the converters once per query as a tuple of (position, converter), with columns
+        that need no conversion removed, so rows are converted with a single call per value.
+        """
         connection = self.connection
-        converters = list(converters.items())
+        plan = []
+        for pos, (convs, expression) in converters.items():
+            # MongoDB returns JSON fields as native dict already
+            if not convs or expression.output_field.db_type(connection) == "json":
+                continue
+            plan.append((pos, _fuse_converters(convs, expression, connection)))
+        return tuple(plan)
+
+    def apply_converters(self, rows, converters):
+        plan = self.get_converter_plan(converters)
+        if not plan:
+            yield from map(list, rows)
+            return
         for row in map(list, rows):
-            for pos, (convs, expression) in converters:
-                value = row[pos]
-                for converter in convs:
-                    # MongoDB returns JSON fields as native dict already
-                    if expression.output_field.db_type(connection) == "json":
-                        continue
-                    value = converter(value, expression, connection)
-                row[pos] = value
+            for pos, convert in plan:
+                row[pos] = convert(row[pos])
             yield row
 
     def results_iter(
@@ -212,26 +867,25 @@ class SQLCompiler(BaseSQLCompiler):
             results = self.execute_sql(MULTI, chunked_fetch=chunked_fetch, chunk_size=chunk_size)
         fields = [s[0] for s in self.select[0 : self.col_count]]
         converters = self.get_converters(fields)
-        rows = chain.from_iterable(results)
-        _row_tuples = []
         cols = self.select[0 : self.col_count]
-        for row in rows:
-            _row_tuples.append(
-                tuple(row.get(alias or col.target.attname) for col, _, alias in cols)
-            )
-
+        # lazy pipeline, only the current batch of the mongo cursor is held in memory
+        rows = (
+            tuple(row.get(self.get_column_key(col, alias)) for col, _, alias in cols)
+            for row in chain.from_iterable(results)
+        )
         if converters:
-            _row_tuples = self.apply_converters(_row_tuples, converters)
+            rows = self.apply_converters(rows, converters)
             if tuple_expected:
-                _row_tuples = map(tuple, _row_tuples)
-        for row in _row_tuples:
-            yield row
+                rows = map(tuple, rows)
+        yield from rows
 
 
 class SQLDeleteCompiler(SQLCompiler):
     def as_operation(self, with_limits=True, with_col_aliases=False):
         opts = self.query.get_meta()
         filter = self.build_mongo_filter(self.query.where).get_mongo_query(self, self.connection)
+        if self.subquery_stages:
+            raise NotImplementedError("Subqueries are not implemented for deletes yet.")
         return {
             "collection": opts.db_table,
             "op": "delete_many",
@@ -252,47 +906,73 @@ class SQLInsertCompiler(SQLCompiler, BaseSQLInsertCompiler):
                 "op": "insert_one",
                 "document": self._fields_to_doc(fields, self.query.objs[0]),
             }
-        elif self.returning_fields:
-            raise NotImplementedError(
-                "Returning fields is not supported for bulk inserts, right now, though very possible"
-            )
+        elif self.query.fields and not any(obj.pk for obj in self.query.objs):
+            # primary keys are assigned client side, so they can be returned without reading
+            documents = [self._fields_to_insert_doc(fields, obj) for obj in self.query.objs]
+            self.inserted_pks = [document[opts.pk.column] for document in documents]
+            return {
+                "collection": opts.db_table,
+                "op": "insert_many",
+                "documents": documents,
+                "ordered": self.ordered,
+            }
         elif self.query.fields:
-            insert_statement = [
-                InsertOne(self._fields_to_doc(fields, obj))
-                if not obj.pk
+            insert_statement = []
+            self.inserted_pks = []
+            for obj in self.query.objs:
+                if not obj.pk:
+                    document = self._fields_to_insert_doc(fields, obj)
+                    insert_statement.append(InsertOne(document))
+                    self.inserted_pks.append(document[opts.pk.column])
+                    continue
                 #  need to upsert if pk is given, because we support single collection inheritance
-                else UpdateOne(
-                    {opts.pk.column: obj.pk},
-                    {
-                        "$set": {
-                            field.column: self.prepare_value(field, self.pre_save_val(field, obj))
-                            for field in fields
-                            if not field.primary_key
-                        }
-                    },
-                    upsert=True,
+                insert_statement.append(
+                    UpdateOne(
+                        {opts.pk.column: obj.pk},
+                        {
+                            "$set": {
+                                field.column: self.prepare_value(
+                                    field, self.pre_save_val(field, obj)
+                                )
+                                for field in fields
+                                if not field.primary_key
+                            }
+                        },
+                        upsert=True,
+                    )
                 )
-                for obj in self.query.objs
-            ]
+                self.inserted_pks.append(obj.pk)
         else:
             # An empty object.
-            insert_statement = [
-                InsertOne({opts.pk.column: self.connection.ops.pk_default_value()})
-                for _ in self.query.objs
-            ]
+            self.inserted_pks = [self.connection.ops.pk_default_value() for _ in self.query.objs]
+            insert_statement = [InsertOne({opts.pk.column: pk}) for pk in self.inserted_pks]
 
         return {
             "collection": opts.db_table,
             "op": "bulk_write",
             "requests": insert_statement,
+            "ordered": self.ordered,
         }
 
+    @property
+    def ordered(self):
+        """Whether bulk inserts stop at the first error, "ORDERED_BULK_WRITES" of the database"""
+        return self.connection.settings_dict.get("ORDERED_BULK_WRITES", True)
+
     def _fields_to_doc(self, fields, obj):
         doc = {}
         for field in fields:
             dug(doc, field.column, self.prepare_value(field, self.pre_save_val(field, obj)))
         return doc
 
+    def _fields_to_insert_doc(self, fields, obj):
+        """Document of a new object, its primary key is assigned client side"""
+        doc = self._fields_to_doc(fields, obj)
+        pk_column = self.query.get_meta().pk.column
+        if doc.get(pk_column) is None:
+            doc[pk_column] = self.connection.ops.pk_default_value()
+        return doc
+
     def execute_sql(self, returning_fields=None):
         assert not (
             returning_fields
@@ -302,9 +982,12 @@ class SQLInsertCompiler(SQLCompiler, BaseSQLInsertCompiler):
         opts = self.query.get_meta()
         self.returning_fields = returning_fields
         with self.connection.cursor() as cursor:
-            cursor.execute(self.as_operation(), None)
+            operation = self.as_operation()
+            cursor.execute(operation, None)
             if not self.returning_fields:
                 return []
+            elif operation["op"] != "insert_one":
+                rows = [(pk,) for pk in self.inserted_pks]
             else:
                 rows = [
                     (
@@ -322,17 +1005,132 @@ class SQLUpdateCompiler(SQLCompiler):
     def as_operation(self):
         opts = self.query.get_meta()
         filter = self.build_mongo_filter(self.query.where).get_mongo_query(self, self.connection)
-        update = {
-            field[0].column: field[0].get_db_prep_save(field[2], self.connection)
-            for field in self.query.values
-        }
+        if self.subquery_stages:
+            raise NotImplementedError("Subqueries are not implemented for updates yet.")
+        values = [
+            (field, self.resolve_update_value(field, value))
+            for field, _, value in self.query.values
+        ]
+        operators = [self.get_update_operator(field, value) for field, value in values]
+        if None in operators:
+            # expressions, which can't be expressed by update operators, need a pipeline update
+            update = [
+                {
+                    "$set": {
+                        field.column: self.get_update_expression(field, value)
+                        for field, value in values
+                    }
+                }
+            ]
+        else:
+            update = {}
+            for (field, _), (operator, operand) in zip(values, operators, strict=True):
+                update.setdefault(operator, {})[field.column] = operand
+        if json_updates := getattr(self.query, "json_updates", None):
+            update = self.add_json_updates(update, *json_updates)
         return {
             "collection": opts.db_table,
             "op": "update_many",
             "filter": filter,
-            "update": {"$set": update},
+            "update": update,
         }
 
+    def add_json_updates(self, update, set_paths: dict, unset_paths: list):
+        """Add the updates of individual key paths of JSON fields"""
+        if isinstance(update, list):
+            if set_paths:
+                update.append({"$set": {path: {"$literal": v} for path, v in set_paths.items()}})
+            if unset_paths:
+                update.append({"$unset": list(unset_paths)})
+            return update
+        if set_paths:
+            update.setdefault("$set", {}).update(set_paths)
+        if unset_paths:
+            update.setdefault("$unset", {}).update(dict.fromkeys(unset_paths, ""))
+        return update
+
+    def resolve_update_value(self, field, value):
+        if hasattr(value, "resolve_expression"):
+            value = value.resolve_expression(self.query, allow_joins=False, for_save=True)
+            if value.contains_aggregate:
+                raise FieldError(
+                    f"Aggregate functions are not allowed in this query ({field.name}={value!r})."
+                )
+        elif hasattr(value, "prepare_database_save"):
+            if not field.remote_field:
+                raise TypeError(
+                    f"Tried to update field {field} with a model instance, {value!r}. "
+                    f"Use a value compatible with {field.__class__.__name__}."
+                )
+            value = value.prepare_database_save(field)
+        return value
+
+    def get_update_operator(self, field, value):
+        """
+        Update operator and operand of the field, None if the value is an expression which can't
+        be expressed by an update operator. Arithmetic of a numeric field with a constant of its
+        type is applied atomically by $inc, $mul, $max (Greatest) and $min (Least).
+        """
+        if not hasattr(value, "resolve_expression"):
+            return "$set", field.get_db_prep_save(value, self.connection)
+        if isinstance(value, Value):
+            return "$set", field.get_db_prep_save(value.value, self.connection)
+        if field.null:
+            # operators fail on null values, in SQL the result is null
+            return None
+
+        match value:
+            case Greatest() | Least():
+                operator = "$max" if isinstance(value, Greatest) else "$min"
+                operand = self.get_update_operand(field, value.get_source_expressions())
+            case CombinedExpression(connector=Combinable.ADD | Combinable.MUL) if isinstance(
+                field, NUMERIC_FIELDS
+            ):
+                operator = "$inc" if value.connector == Combinable.ADD else "$mul"
+                operand = self.get_update_operand(field, [value.lhs, value.rhs])
+            case CombinedExpression(connector=Combinable.SUB, rhs=Value()) if isinstance(
+                field, NUMERIC_FIELDS
+            ):
+                operator = "$inc"
+                operand = self.get_update_operand(field, [value.lhs, value.rhs])
+                operand = -operand if operand is not None else None
+            case _:
+                return None
+        if operand is None:
+            return None
+        return operator, field.get_db_prep_save(operand, self.connection)
+
+    def get_update_operand(self, field, sources):
+        """
+        Constant of a binary expression of the field and a constant, None if there is none or
+        it isn't a value of the field, e.g. a float multiplier of an integer field.
+        """
+        match sources:
+            case [Col(target=target), Value(value=operand)] if target == field:
+                pass
+            case [Value(value=operand), Col(target=target)] if target == field:
+                pass
+            case _:
+                return None
+        try:
+            if operand is None or field.to_python(operand) != operand:
+                return None
+        except (ValidationError, TypeError, ValueError):
+            return None
+        return operand
+
+    def get_update_expression(self, field, value):
+        """Aggregation expression of the value for a pipeline update"""
+        if not hasattr(value, "resolve_expression"):
+            return {"$literal": field.get_db_prep_save(value, self.connection)}
+        expression = expression_to_mongo(value, self, self.connection)
+        if isinstance(field, IntegerField) and not isinstance(
+            value._output_field_or_none, IntegerField
+        ):
+            # the result is rounded to an integer, as an integer column stores it in SQL
+            expression = {"$toLong": {"$round": [expression, 0]}}
+        return expression
+
     def execute_sql(self, result_type):
         """
         Execute the specified update. Return the number of rows affected by
@@ -1,7 +1,10 @@
 import json
 import logging
+from collections.abc import Iterator
 
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument
+from pymongo.client_session import ClientSession
+from pymongo.command_cursor import CommandCursor
 from pymongo.cursor import Cursor as MongoCursor
 from pymongo.results import (
     DeleteResult,
@@ -16,17 +19,18 @@ logger = logging.getLogger(__name__)
 
 
 class Cursor:
-    def __init__(self, mongo_client: MongoClient, connection):
+    def __init__(self, mongo_client: MongoClient, connection, session: ClientSession | None = None):
         self.mongo_client = mongo_client
         self.connection = connection
-        self.result: MongoCursor | InsertManyResult | DeleteResult | None = None
+        self.result: (
+            MongoCursor | CommandCursor | Iterator | InsertManyResult | DeleteResult | None
+        ) = None
         self.batch_size = None
-        self.session = mongo_client.start_session()
+        # borrowed from the DatabaseWrapper, which owns (and ends) the session
+        self.session = session
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
-        if self.session:
-            self.session.end_session()
 
     def close(self):
         if self.result is not None and hasattr(self.result, "close"):
@@ -74,38 +78,100 @@ class Cursor:
 
     def execute(self, command, params=None):
         logger.debug(json.dumps(command, default=str))
-        match command:
-            case {"op": "aggregate"}:
-                self.result = self.connection[command["collection"]].aggregate(
-                    command["pipeline"], session=self.session
-                )
-            case {"op": "insert_one"}:
-                self.result = self.connection[command["collection"]].insert_one(
-                    command["document"], session=self.session
-                )
-            case {"op": "update_many"}:
-                self.result = self.connection[command["collection"]].update_many(
-                    command["filter"], command["update"], session=self.session
-                )
-            case {"op": "bulk_write"}:
-                self.result = self.connection[command["collection"]].bulk_write(
-                    command["requests"], session=self.session
-                )
-            case {"op": "delete_many"}:
-                self.result = self.connection[command["collection"]].delete_many(
-                    command["filter"], session=self.session
-                )
-            case _:
-                raise NotSupportedError
+        try:
+            operation = self.operations[command["op"]]
+        except (KeyError, TypeError):
+            raise NotSupportedError from None
+        self.result = operation(self, self.connection[command["collection"]], command)
+
+    def _aggregate(self, collection, command):
+        options = {}
+        if command.get("batch_size"):
+            options["batchSize"] = command["batch_size"]
+        return collection.aggregate(command["pipeline"], session=self.session, **options)
+
+    def _find(self, collection, command):
+        options = {
+            key: command[key] for key in ("projection", "sort", "skip", "limit") if key in command
+        }
+        if command.get("batch_size"):
+            options["batch_size"] = command["batch_size"]
+        return collection.find(command["filter"], session=self.session, **options)
+
+    def _find_one(self, collection, command):
+        options = {key: command[key] for key in ("projection", "sort", "skip") if key in command}
+        document = collection.find_one(command["filter"], session=self.session, **options)
+        return iter([document] if document is not None else [])
+
+    def _estimated_document_count(self, collection, command):
+        return iter([{command["alias"]: collection.estimated_document_count()}])
+
+    def _find_one_and_update(self, collection, command):
+        return collection.find_one_and_update(
+            command["filter"],
+            command["update"],
+            projection=command.get("projection"),
+            upsert=command.get("upsert", False),
+            return_document=ReturnDocument.AFTER,
+            session=self.session,
+        )
+
+    def _insert_one(self, collection, command):
+        return collection.insert_one(command["document"], session=self.session)
+
+    def _update_one(self, collection, command):
+        return collection.update_one(
+            command["filter"],
+            command["update"],
+            upsert=command.get("upsert", False),
+            session=self.session,
+        )
+
+    def _update_many(self, collection, command):
+        return collection.update_many(command["filter"], command["update"], session=self.session)
+
+    def _insert_many(self, collection, command):
+        return collection.insert_many(
+            command["documents"], ordered=command.get("ordered", True), session=self.session
+        )
+
+    def _bulk_write(self, collection, command):
+        return collection.bulk_write(
+            command["requests"], ordered=command.get("ordered", True), session=self.session
+        )
+
+    def _create_index(self, collection, command):
+        return collection.create_index(
+            command["keys"], session=self.session, **command.get("options", {})
+        )
+
+    def _delete_many(self, collection, command):
+        return collection.delete_many(command["filter"], session=self.session)
+
+    # the methods executing the operations, keyed by their "op"
+    operations = {
+        "aggregate": _aggregate,
+        "find": _find,
+        "find_one": _find_one,
+        "estimated_document_count": _estimated_document_count,
+        "find_one_and_update": _find_one_and_update,
+        "insert_one": _insert_one,
+        "update_one": _update_one,
+        "update_many": _update_many,
+        "insert_many": _insert_many,
+        "bulk_write": _bulk_write,
+        "create_index": _create_index,
+        "delete_many": _delete_many,
+    }
 
     def fetchmany(self, size=1):
         rows = []
-        if self.batch_size != size:
+        if self.batch_size != size and hasattr(self.result, "batch_size"):
             self.batch_size = size
             self.result.batch_size(size)
         for _ in range(size):
             try:
-                rows.append(self.result.next())
+                rows.append(next(self.result))
             except StopIteration:
                 return rows
 
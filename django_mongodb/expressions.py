@@ -12,3 +12,13 @@ class RawMongoDBQuery(Expression):
 
     def _resolve_output_field(self):
         return fields.BooleanField()
+
+
+class SearchScore(Expression):
+    """Relevance score of the document in the results of the $search stage."""
+
+    output_field = fields.FloatField()
+
+    def as_sql(self, compiler, connection):
+        # projected by the compiler, there is no SQL for the score
+        return "searchScore", []
@@ -7,3 +7,4 @@ class DatabaseFeatures(BaseDatabaseFeatures):
     supports_json_field = True
     has_native_json_field = True
     supports_unlimited_charfield = True
+    can_return_rows_from_bulk_insert = True
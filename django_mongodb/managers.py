@@ -1,10 +1,44 @@
 from typing import Generic, Literal, TypeVar
 
-from django.db import models
+from bson import ObjectId
+from django.db import connections, models
+from django.db.models import JSONField
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.signals import post_save, pre_save
+from django.db.models.sql import Query, UpdateQuery
+from django.db.models.utils import resolve_callables
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from django_mongodb.expressions import SearchScore
+from django_mongodb.models import is_upsertable
+from django_mongodb.pagination import (
+    FacetPaginator,
+    get_seek_filter,
+    get_seek_order,
+    get_seek_token,
+    get_seek_values,
+)
+from django_mongodb.query import MongoSelect
+
+try:
+    from django.db.models.sql.constants import ROW_COUNT
+except ImportError:
+    from django.db.models.sql.constants import CURSOR as ROW_COUNT
 
 T = TypeVar("T")
 
 
+class BulkUpdateResult(int):
+    """Number of matched documents of a bulk update, with the number of modified documents"""
+
+    def __new__(cls, matched_count: int, modified_count: int):
+        result = super().__new__(cls, matched_count)
+        result.matched_count = matched_count
+        result.modified_count = modified_count
+        return result
+
+
 class MongoQuerySet(Generic[T], models.QuerySet[T]):
     """QuerySet which uses MongoDB as backend"""
 
@@ -12,6 +46,9 @@ class MongoQuerySet(Generic[T], models.QuerySet[T]):
         super().__init__(*args, **kwargs)
         self._prefer_search = False
         self._aggregation_stages = []
+        self._estimated_count = False
+        self._seek_order = None
+        self._search_stored_source = False
 
     def prefer_search(self, prefer_search=True):
         obj = self._chain()
@@ -19,6 +56,35 @@ class MongoQuerySet(Generic[T], models.QuerySet[T]):
         obj.query.prefer_search = prefer_search
         return obj
 
+    def allow_estimated_count(self, allow=True):
+        """
+        Allow count() of the unfiltered collection to return the estimated document count of
+        the collection metadata, instead of counting all documents.
+        """
+        obj = self._chain()
+        obj._estimated_count = allow
+        obj.query.estimated_count = allow
+        return obj
+
+    def search(self, score: str | None = None, order_by_score=False, stored_source=False):
+        """
+        Query with the $search stage (see prefer_search()). `score` annotates the results with
+        their search score, `order_by_score` orders them by descending relevance, and
+        `stored_source` returns the documents from the stored source of the search index
+        (MongoMeta.search_stored_fields), if all selected fields are stored.
+        """
+        obj = self.prefer_search()
+        if score:
+            obj = obj.annotate(**{score: SearchScore()})
+        if order_by_score:
+            # $search returns the results in the order of their score without a sort option,
+            # $text queries are sorted by their score
+            obj = obj.order_by()
+            obj.query.order_by_score = True
+        obj._search_stored_source = stored_source
+        obj.query.search_stored_source = stored_source
+        return obj
+
     def add_aggregation_stage(
         self,
         stage: dict,
@@ -29,6 +95,230 @@ class MongoQuerySet(Generic[T], models.QuerySet[T]):
         obj.query.aggregation_stages = obj._aggregation_stages
         return obj
 
+    def seek(self, after: str | None = None, order_by=("pk",)):
+        """
+        Order by the sort keys, with the primary key as tiebreaker, and return the rows after
+        the continuation token of get_seek_token() by a range predicate on the sort keys,
+        which doesn't scan the previous rows like an offset.
+        """
+        order = get_seek_order(self.model, order_by)
+        obj = self.order_by(
+            *(f"{'-' if descending else ''}{field.name}" for field, descending in order)
+        )
+        if after is not None:
+            obj = obj.filter(get_seek_filter(order, get_seek_values(after, order)))
+        obj._seek_order = order
+        return obj
+
+    def get_seek_token(self, obj) -> str:
+        """Continuation token of the rows after obj, in the order of seek()"""
+        if self._seek_order is None:
+            raise TypeError("get_seek_token() requires a queryset ordered by seek().")
+        return get_seek_token(obj, self._seek_order)
+
+    def page(self, number: int, size: int):
+        """Page of the queryset, read with its total number of rows in one aggregate"""
+        return FacetPaginator(self, size).page(number)
+
+    def bulk_update(self, objs, fields, batch_size=None, ordered=True) -> BulkUpdateResult:
+        """
+        Update the given fields of the objects with one bulk_write of UpdateOne requests per
+        batch, instead of an update_many per object. Unordered bulk writes continue after
+        errors.
+        """
+        if batch_size is not None and batch_size <= 0:
+            raise ValueError("Batch size must be a positive integer.")
+        if not fields:
+            raise ValueError("Field names must be given to bulk_update().")
+        objs = tuple(objs)
+        if any(obj.pk is None for obj in objs):
+            raise ValueError("All bulk_update() objects must have a primary key set.")
+        opts = self.model._meta
+        fields = [opts.get_field(name) for name in fields]
+        if any(not field.concrete or field.many_to_many for field in fields):
+            raise ValueError("bulk_update() can only be used with concrete fields.")
+        if any(field.primary_key for field in fields):
+            raise ValueError("bulk_update() cannot be used with primary key fields.")
+        if not objs:
+            return BulkUpdateResult(0, 0)
+        for obj in objs:
+            obj._prepare_related_fields_for_save(operation_name="bulk_update", fields=fields)
+
+        connection = connections[self.db]
+        batch_size = batch_size or len(objs)
+        matched_count = modified_count = 0
+        for start in range(0, len(objs), batch_size):
+            requests = self._get_bulk_update_requests(
+                objs[start : start + batch_size], fields, connection
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    {
+                        "collection": opts.db_table,
+                        "op": "bulk_write",
+                        "requests": requests,
+                        "ordered": ordered,
+                    }
+                )
+                matched_count += cursor.result.matched_count
+                modified_count += cursor.result.modified_count
+        return BulkUpdateResult(matched_count, modified_count)
+
+    bulk_update.alters_data = True
+
+    def _get_bulk_update_requests(self, objs, fields, connection) -> list[UpdateOne]:
+        """UpdateOne requests, which $set the fields of the objects"""
+        pk_field = self.model._meta.pk
+        requests = []
+        for obj in objs:
+            update = {}
+            for field in fields:
+                value = getattr(obj, field.attname)
+                if hasattr(value, "resolve_expression"):
+                    raise NotImplementedError("Expressions are not supported by bulk_update().")
+                update[field.column] = field.get_db_prep_save(value, connection)
+            pk = pk_field.get_db_prep_value(obj.pk, connection)
+            requests.append(UpdateOne({pk_field.column: pk}, {"$set": update}))
+        return requests
+
+    def update_json(self, field_name: str, values: dict | None = None, unset=()) -> int:
+        """
+        $set and $unset key paths of a JSON field of the matching documents, without reading
+        or rewriting the whole field. Key paths are separated by "__", as in lookups.
+        """
+        self._not_support_combined_queries("update_json")
+        if self.query.is_sliced:
+            raise TypeError("Cannot update a query once a slice has been taken.")
+        field = self.model._meta.get_field(field_name)
+        if not isinstance(field, JSONField):
+            raise TypeError(f"update_json() requires a JSONField, {field_name} is not.")
+        if not values and not unset:
+            return 0
+
+        def path(key_path):
+            return ".".join([field.column, *key_path.split("__")])
+
+        self._for_write = True
+        query = self.query.chain(UpdateQuery)
+        query.json_updates = (
+            {path(key_path): value for key_path, value in (values or {}).items()},
+            [path(key_path) for key_path in unset],
+        )
+        query.annotations = {}
+        rows = query.get_compiler(self.db).execute_sql(ROW_COUNT)
+        self._result_cache = None
+        return rows
+
+    update_json.alters_data = True
+
+    def get_or_create(self, defaults=None, **kwargs):
+        """
+        Get or insert the object with a single find_one_and_update upsert, instead of a read,
+        an insert and a re-read after a conflicting insert. Only a unique index on the lookup
+        fields prevents concurrent calls from inserting duplicates.
+        """
+        result = self._find_one_and_upsert(kwargs, defaults or {}, update=False)
+        if result is None:
+            return super().get_or_create(defaults=defaults, **kwargs)
+        return result
+
+    get_or_create.alters_data = True
+
+    def update_or_create(self, defaults=None, create_defaults=None, **kwargs):
+        """
+        Update or insert the object with a single find_one_and_update upsert, see
+        get_or_create(). Separate create_defaults require Django's read and write.
+        """
+        result = None
+        if create_defaults is None:
+            result = self._find_one_and_upsert(kwargs, defaults or {}, update=True)
+        if result is None:
+            return super().update_or_create(
+                defaults=defaults, create_defaults=create_defaults, **kwargs
+            )
+        return result
+
+    update_or_create.alters_data = True
+
+    def _find_one_and_upsert(self, kwargs, defaults, update):
+        """
+        $setOnInsert the fields of a new object and, if update, $set the defaults (and auto_now
+        fields) of the matched document. Return (object, created), or None if the model or the
+        lookups are not supported, e.g. save signal receivers, primary key or join lookups.
+        """
+        opts = self.model._meta
+        pk_names = {"pk", opts.pk.name, opts.pk.attname}
+        defaults = dict(resolve_callables(defaults))
+        if (
+            not is_upsertable(opts)
+            or self.query.annotations
+            or pre_save.has_listeners(self.model)
+            or post_save.has_listeners(self.model)
+            or any(lookup.split(LOOKUP_SEP)[0] in pk_names for lookup in kwargs)
+            or any(
+                hasattr(value, "resolve_expression")
+                for value in (*kwargs.values(), *defaults.values())
+            )
+        ):
+            return None
+        query = self.filter(**kwargs).query
+        compiler = query.get_compiler(self.db)
+        try:
+            filter = compiler.build_mongo_filter(query.where).get_mongo_query(
+                compiler, compiler.connection
+            )
+        except NotImplementedError:
+            return None
+        if compiler.subquery_stages:
+            return None
+
+        connection = connections[self.db]
+        obj = self.model(**self._extract_model_params(defaults, **kwargs))
+        update_names = set(defaults) if update else set()
+        pk = ObjectId()
+        set_on_insert = {opts.pk.column: pk}
+        set_fields = {}
+        for field in opts.concrete_fields:
+            if field.column == opts.pk.column or getattr(field, "generated", False):
+                continue
+            value = field.get_db_prep_save(field.pre_save(obj, True), connection)
+            if update and (
+                field.name in update_names
+                or field.attname in update_names
+                or getattr(field, "auto_now", False)
+            ):
+                set_fields[field.column] = value
+            else:
+                set_on_insert[field.column] = value
+        operators = {"$setOnInsert": set_on_insert}
+        if set_fields:
+            operators["$set"] = set_fields
+        # the document is returned in the row layout of a select of the model
+        select_compiler = Query(self.model).get_compiler(self.db)
+        select_compiler.setup_query()
+        [projection] = MongoSelect(select_compiler.select, select_compiler.mongo_meta).get_mongo(
+            select_compiler, connection
+        )
+        command = {
+            "collection": opts.db_table,
+            "op": "find_one_and_update",
+            "filter": filter,
+            "update": operators,
+            "projection": projection["$project"],
+            "upsert": True,
+        }
+        with connection.cursor() as cursor:
+            try:
+                cursor.execute(command)
+            except DuplicateKeyError:
+                # a concurrent upsert inserted the document, which matches the filter now
+                cursor.execute(command)
+            document = cursor.result
+
+        row = next(select_compiler.results_iter(results=[[document]]))
+        field_names = [col.target.attname for col, _, _ in select_compiler.select]
+        return self.model.from_db(self.db, field_names, row), document[opts.pk.column] == pk
+
     def _chain(self):
         """
         Add the _prefer_search hint to the chained query
@@ -38,17 +328,24 @@ class MongoQuerySet(Generic[T], models.QuerySet[T]):
             obj.query.prefer_search = obj._prefer_search
         if obj._aggregation_stages:
             obj.query.aggregation_stages = obj._aggregation_stages
+        if obj._estimated_count:
+            obj.query.estimated_count = obj._estimated_count
+        if obj._search_stored_source:
+            obj.query.search_stored_source = obj._search_stored_source
         return obj
 
     def _clone(self):
         obj = super()._clone()
         obj._prefer_search = self._prefer_search
         obj._aggregation_stages = self._aggregation_stages
+        obj._estimated_count = self._estimated_count
+        obj._seek_order = self._seek_order
+        obj._search_stored_source = self._search_stored_source
         return obj
 
 
-class MongoManager(Generic[T], models.Manager[T]):
-    """Manager which uses MongoDB as backend"""
+class MongoManager(Generic[T], models.Manager.from_queryset(MongoQuerySet)[T]):
+    """Manager which uses MongoDB as backend, with the methods of MongoQuerySet"""
 
     def get_queryset(self) -> MongoQuerySet[T]:
         return MongoQuerySet(self.model, using=self._db)
@@ -1,6 +1,10 @@
+import json
+
 import bson
-from django.db import models
+from django.db import DatabaseError, connections, models, router
+from django.db.models.expressions import DatabaseDefault, Value
 from django.db.models.fields import AutoField, AutoFieldMeta
+from django.db.models.signals import post_save, pre_save
 from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
@@ -61,4 +65,233 @@ class ObjectIdAutoField(ObjectIdFieldMixin, AutoField, metaclass=AutoFieldMeta):
         return ObjectIdField().db_type(connection=connection)
 
 
-__all__ = ["ObjectIdField", "ObjectIdAutoField", "DecimalField"]
+class DirtyFieldsMixin:
+    """
+    Model mixin, which snapshots the field values of loaded and saved instances, so that
+    `save()` only updates the changed fields. A save without changes skips the write.
+    JSON values are snapshotted by the hash of their serialization.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_state = instance._get_field_state()
+        return instance
+
+    def _get_field_state(self):
+        state = {}
+        for field in self._meta.concrete_fields:
+            if field.attname not in self.__dict__:
+                continue  # deferred
+            value = getattr(self, field.attname)
+            if isinstance(field, models.JSONField):
+                value = hash(json.dumps(value, sort_keys=True, default=str))
+            state[field.attname] = value
+        return state
+
+    def get_dirty_fields(self) -> list[str]:
+        """Names of the fields changed since the instance was loaded or saved"""
+        loaded_state = getattr(self, "_loaded_state", None) or {}
+        state = self._get_field_state()
+        return [
+            field.name
+            for field in self._meta.concrete_fields
+            if field.attname in state
+            and (
+                field.attname not in loaded_state
+                or state[field.attname] != loaded_state[field.attname]
+            )
+        ]
+
+    def save(self, *args, **kwargs):
+        if (
+            not args
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+            and not self._state.adding
+            and getattr(self, "_loaded_state", None) is not None
+            and kwargs.get("using", self._state.db) == self._state.db
+        ):
+            dirty_fields = self.get_dirty_fields()
+            if not dirty_fields:
+                return
+            if self._meta.pk.name not in dirty_fields:
+                # auto_now fields are set by every save
+                auto_now_fields = [
+                    field.name
+                    for field in self._meta.concrete_fields
+                    if getattr(field, "auto_now", False) and field.name not in dirty_fields
+                ]
+                kwargs["update_fields"] = dirty_fields + auto_now_fields
+        super().save(*args, **kwargs)
+        self._loaded_state = self._get_field_state()
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        state = self._get_field_state()
+        if fields is not None:
+            # only the refreshed fields are clean, e.g. when loading a deferred field
+            refreshed = {
+                field.attname
+                for field in self._meta.concrete_fields
+                if field.name in fields or field.attname in fields
+            }
+            state = {
+                **(getattr(self, "_loaded_state", None) or {}),
+                **{attname: value for attname, value in state.items() if attname in refreshed},
+            }
+        self._loaded_state = state
+
+
+def is_upsertable(opts) -> bool:
+    """
+    Whether the documents of the model are written by a single upsert: the primary key is an
+    ObjectIdAutoField (of the root parent) and all parents are stored in the same collection.
+    """
+    pk = opts.pk
+    while pk.remote_field and pk.remote_field.parent_link:
+        pk = pk.target_field
+    return isinstance(pk, ObjectIdAutoField) and all(
+        parent._meta.db_table == opts.db_table for parent in opts.get_parent_list()
+    )
+
+
+class UpsertSaveMixin:
+    """
+    Model mixin, which saves instances with a primary key by a single upsert of the fields of
+    the model and its same collection parents, instead of an update (per parent) followed by
+    an insert if nothing matched. Saves with `update_fields` update without upserting.
+    """
+
+    def _can_upsert(self, cls, raw, force_update):
+        return self.pk is not None and not raw and not force_update and is_upsertable(cls._meta)
+
+    def save_base(
+        self, raw=False, force_insert=False, force_update=False, using=None, update_fields=None
+    ):
+        using = using or router.db_for_write(self.__class__, instance=self)
+        cls = origin = self.__class__
+        if cls._meta.proxy:
+            cls = cls._meta.concrete_model
+        if update_fields is not None:
+            update_fields = frozenset(update_fields)
+            if non_model_fields := update_fields - cls._meta._non_pk_concrete_field_names:
+                raise ValueError(
+                    "The following fields do not exist in this model, are m2m fields, or are "
+                    f"non-concrete fields: {', '.join(non_model_fields)}"
+                )
+        if not raw:
+            self._set_parent_keys(cls)
+        if force_insert or not self._can_upsert(cls, raw, force_update):
+            return super().save_base(
+                raw=raw,
+                force_insert=force_insert,
+                force_update=force_update,
+                using=using,
+                update_fields=update_fields,
+            )
+        meta = cls._meta
+        if not meta.auto_created:
+            pre_save.send(
+                sender=origin, instance=self, raw=raw, using=using, update_fields=update_fields
+            )
+        created = self._upsert(cls, using, update_fields)
+        self._state.db = using
+        self._state.adding = False
+        if not meta.auto_created:
+            post_save.send(
+                sender=origin,
+                instance=self,
+                created=created,
+                update_fields=update_fields,
+                raw=raw,
+                using=using,
+            )
+
+    save_base.alters_data = True
+
+    def _set_parent_keys(self, cls):
+        """
+        Set the primary keys of the parents and the parent links from each other, as
+        Model._save_parents() does, which the upsert replaces.
+        """
+        for parent, field in cls._meta.parents.items():
+            if (
+                field
+                and getattr(self, parent._meta.pk.attname) is None
+                and getattr(self, field.attname) is not None
+            ):
+                setattr(self, parent._meta.pk.attname, getattr(self, field.attname))
+            self._set_parent_keys(parent)
+            if field:
+                setattr(self, field.attname, self._get_pk_val(parent._meta))
+                if field.is_cached(self):
+                    field.delete_cached_value(self)
+
+    def _is_insert_only(self, field, add) -> bool:
+        """
+        Whether the field is only set if the document is inserted: auto_now_add fields and
+        database defaults of a new instance.
+        """
+        if not add:
+            return False
+        if getattr(field, "auto_now_add", False) and not getattr(field, "auto_now", False):
+            return True
+        return isinstance(getattr(self, field.attname), DatabaseDefault)
+
+    def _upsert(self, cls, using, update_fields):
+        """Upsert the document, return whether it was inserted"""
+        meta = cls._meta
+        connection = connections[using]
+        add = self._state.adding
+        update = {}
+        insert = {}
+        for field in meta.concrete_fields:
+            # parent links share the primary key column
+            if field.column == meta.pk.column or getattr(field, "generated", False):
+                continue
+            if update_fields is not None and not {field.name, field.attname} & update_fields:
+                continue
+            if not self._is_insert_only(field, add):
+                value = field.get_db_prep_save(field.pre_save(self, False), connection)
+                update[field.column] = value
+                continue
+            # the stored values of an existing document are kept, even for a new instance
+            value = field.pre_save(self, add)
+            if isinstance(value, DatabaseDefault):
+                if not isinstance(field.db_default, Value):
+                    raise NotImplementedError("Upserts only support constant database defaults.")
+                value = field.db_default.value
+            insert[field.column] = field.get_db_prep_save(value, connection)
+        pk = meta.pk.get_db_prep_value(self.pk, connection)
+        operators = {}
+        if update or not insert:
+            # the update needs an operator, without fields the primary key is set
+            operators["$set"] = update or {meta.pk.column: pk}
+        if insert:
+            operators["$setOnInsert"] = insert
+        with connection.cursor() as cursor:
+            cursor.execute(
+                {
+                    "collection": meta.db_table,
+                    "op": "update_one",
+                    "filter": {meta.pk.column: pk},
+                    "update": operators,
+                    "upsert": update_fields is None,
+                }
+            )
+            result = cursor.result
+        if update_fields is not None and not result.matched_count:
+            raise DatabaseError("Save with update_fields did not affect any rows.")
+        return result.upserted_id is not None
+
+    _upsert.alters_data = True
+
+
+__all__ = [
+    "ObjectIdField",
+    "ObjectIdAutoField",
+    "DecimalField",
+    "DirtyFieldsMixin",
+    "UpsertSaveMixin",
+]
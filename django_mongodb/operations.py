@@ -2,12 +2,21 @@ import datetime
 from decimal import Decimal
 
 from bson import ObjectId
+from bson.codec_options import CodecOptions, TypeDecoder, TypeRegistry
 from bson.decimal128 import Decimal128
 from django.conf import settings
 from django.db.backends.base.operations import BaseDatabaseOperations
+from django.utils.functional import cached_property
 from django.utils.timezone import is_aware, make_aware
 
 
+class Decimal128Decoder(TypeDecoder):
+    bson_type = Decimal128
+
+    def transform_bson(self, value):
+        return value.to_decimal()
+
+
 class DatabaseOperations(BaseDatabaseOperations):
     compiler_module = "django_mongodb.compiler"
 
@@ -84,17 +93,31 @@ class DatabaseOperations(BaseDatabaseOperations):
         # Fallback to Decimal conversion
         return Decimal(str(value))
 
+    @cached_property
+    def codec_options(self):
+        """
+        Codec options used with "CODEC_DECODING", decoding Decimal128 and (with USE_TZ) aware
+        datetimes while pymongo decodes the BSON, instead of converting every value afterward.
+        The codec applies to whole documents, so values nested in JSONField data are decoded too.
+        """
+        return CodecOptions(
+            tz_aware=settings.USE_TZ,
+            tzinfo=datetime.UTC if settings.USE_TZ else None,
+            type_registry=TypeRegistry([Decimal128Decoder()]),
+        )
+
     def get_db_converters(self, expression):
         converters = super().get_db_converters(expression)
         internal_type = expression.output_field.get_internal_type()
+        codec_decoding = self.connection.settings_dict.get("CODEC_DECODING", False)
         match internal_type:
             case "TimeField":
                 converters.append(self.convert_time_value)
             case "DateField":
                 converters.append(self.convert_date_value)
-            case "DateTimeField":
+            case "DateTimeField" if not (codec_decoding and settings.USE_TZ):
                 converters.append(self.convert_datetime_value)
-            case "DecimalField":
+            case "DecimalField" if not codec_decoding:
                 converters.append(self.convert_decimalfield_value)
         return converters
 
@@ -0,0 +1,201 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from functools import reduce
+from operator import or_
+
+from django.core.paginator import EmptyPage, InvalidPage, PageNotAnInteger, Paginator
+from django.db.models import Q
+
+
+class InvalidSeekToken(InvalidPage):
+    pass
+
+
+def get_seek_order(model, order_by: Sequence[str]) -> list[tuple]:
+    """
+    (field, descending) of the sort keys, with the primary key as tiebreaker, so that the
+    order is total.
+    """
+    opts = model._meta
+    order = []
+    for name in order_by:
+        descending = name.startswith("-")
+        name = name.removeprefix("-")
+        field = opts.pk if name == "pk" else opts.get_field(name)
+        if not field.concrete or field.many_to_many:
+            raise ValueError(f"Can't seek by {name}, only by concrete fields of the model.")
+        order.append((field, descending))
+    if not any(field.primary_key for field, _ in order):
+        order.append((opts.pk, False))
+    return order
+
+
+def get_seek_token(obj, order) -> str:
+    """Opaque continuation token of the rows after obj"""
+    values = [getattr(obj, field.attname) for field, _ in order]
+    keys = [f"{'-' if descending else ''}{field.name}" for field, descending in order]
+    data = json.dumps({"o": keys, "v": values}, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def get_seek_values(token: str, order) -> list:
+    """Values of the sort keys of a continuation token"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        keys, values = data["o"], data["v"]
+    except (binascii.Error, ValueError, TypeError, KeyError) as e:
+        raise InvalidSeekToken("Invalid seek token.") from e
+    if keys != [f"{'-' if descending else ''}{field.name}" for field, descending in order]:
+        raise InvalidSeekToken("The seek token was created for another order.")
+    return [
+        None if value is None else field.to_python(value)
+        for (field, _), value in zip(order, values, strict=True)
+    ]
+
+
+def get_seek_filter(order, values) -> Q:
+    """
+    Range predicate of the rows after the values in the order: the first sort key after its
+    value, or equal and the next key after its value, and so on. MongoDB sorts null (and
+    missing) values first, so they come last in descending order.
+    """
+    branches = []
+    equal = Q()
+    for (field, descending), value in zip(order, values, strict=True):
+        name = field.name
+        if value is None:
+            after = None if descending else Q(**{f"{name}__isnull": False})
+        elif descending:
+            after = Q(**{f"{name}__lt": value})
+            if field.null:
+                after |= Q(**{f"{name}__isnull": True})
+        else:
+            after = Q(**{f"{name}__gt": value})
+        if after is not None:
+            branches.append(equal & after)
+        equal &= Q(**{f"{name}__isnull": True}) if value is None else Q(**{name: value})
+    if not branches:
+        return Q(pk__in=[])
+    predicate = reduce(or_, branches)
+    # bound the index scan by the first sort key, the branches only exclude its equal values
+    (field, descending), value = order[0], values[0]
+    if value is not None and not (descending and field.null):
+        predicate &= Q(**{f"{field.name}__{'lte' if descending else 'gte'}": value})
+    return predicate
+
+
+class SeekPage(Sequence):
+    """
+    Page of a SeekPaginator, which mimics the Django Page interface. The page "numbers" are
+    the continuation tokens, only the next page can be navigated to.
+    """
+
+    def __init__(self, object_list, token, next_token, paginator):
+        self.object_list = object_list
+        self.number = token
+        self.next_token = next_token
+        self.paginator = paginator
+
+    def __repr__(self):
+        return f"<SeekPage after {self.number}>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_token is not None
+
+    def has_previous(self):
+        return False
+
+    def has_other_pages(self):
+        return self.has_next()
+
+    def next_page_number(self):
+        if self.next_token is None:
+            raise InvalidPage("That page contains no results")
+        return self.next_token
+
+    def previous_page_number(self):
+        raise InvalidPage("Seek pages can only be navigated forward")
+
+
+class SeekPaginator:
+    """
+    Keyset paginator, which seeks the page after a continuation token by a range predicate on
+    the sort keys, instead of skipping the rows of the previous pages.
+    """
+
+    def __init__(self, object_list, per_page, order_by: Sequence[str] = ("pk",)):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.order_by = tuple(order_by)
+
+    def get_page(self, token=None):
+        """Return the page after the token, or the first page for an empty or invalid token"""
+        try:
+            return self.page(token or None)
+        except InvalidSeekToken:
+            return self.page(None)
+
+    def page(self, token=None):
+        queryset = self.object_list.seek(after=token, order_by=self.order_by)
+        rows = list(queryset[: self.per_page + 1])
+        next_token = None
+        if len(rows) > self.per_page:
+            rows = rows[: self.per_page]
+            next_token = queryset.get_seek_token(rows[-1])
+        return SeekPage(rows, token, next_token, self)
+
+
+class FacetPaginator(Paginator):
+    """
+    Paginator, which reads a page and the total number of rows with one aggregate ($facet of
+    the page and the count), instead of a count followed by the page query.
+    """
+
+    def validate_number(self, number):
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages["invalid_page"]) from None
+        if number < 1:
+            raise EmptyPage(self.error_messages["min_page"])
+        return number
+
+    def get_page(self, number):
+        try:
+            number = self.validate_number(number)
+        except PageNotAnInteger:
+            number = 1
+        except EmptyPage:
+            number = self.num_pages
+        try:
+            return self.page(number)
+        except EmptyPage:
+            return self.page(self.num_pages)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        queryset = self.object_list[bottom : bottom + self.per_page + self.orphans]
+        queryset.query.with_total = True
+        rows = list(queryset)
+        # the count is known now, don't count again
+        self.__dict__["count"] = queryset.query.total
+        self.__dict__.pop("num_pages", None)
+        if number > self.num_pages:
+            if number == 1 and self.allow_empty_first_page:
+                pass
+            else:
+                raise EmptyPage(self.error_messages["no_results"])
+        if bottom + self.per_page + self.orphans < self.count:
+            rows = rows[: self.per_page]
+        return self._get_page(rows, number, self)
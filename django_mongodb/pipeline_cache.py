@@ -0,0 +1,86 @@
+import threading
+from collections import OrderedDict
+
+
+class Param:
+    """Parameter slot in a cached operation template."""
+
+    __slots__ = ("index",)
+
+    def __init__(self, index: int):
+        self.index = index
+
+    def __repr__(self):
+        return f"Param({self.index})"
+
+
+def bind_params(template, params: list):
+    """Copy the operation template, replacing the parameter slots with the given values."""
+    match template:
+        case Param():
+            return params[template.index]
+        case dict():
+            return {key: bind_params(value, params) for key, value in template.items()}
+        case list():
+            return [bind_params(value, params) for value in template]
+        case tuple():
+            return tuple(bind_params(value, params) for value in template)
+        case _:
+            return template
+
+
+class PipelineCache:
+    """Bounded LRU cache of operation templates, keyed by the query shape."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._templates: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            template = self._templates.get(key)
+            if template is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._templates.move_to_end(key)
+            return template
+
+    def set(self, key, template):
+        with self._lock:
+            self._templates[key] = template
+            self._templates.move_to_end(key)
+            while len(self._templates) > self.maxsize:
+                self._templates.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._templates)
+
+
+_pipeline_caches: dict[str, PipelineCache] = {}
+_pipeline_caches_lock = threading.Lock()
+
+
+def get_pipeline_cache(connection) -> PipelineCache | None:
+    """
+    Return the process wide pipeline cache of the database alias, None if "PIPELINE_CACHE_SIZE"
+    is not configured.
+    """
+    maxsize = connection.settings_dict.get("PIPELINE_CACHE_SIZE", 0)
+    if not maxsize:
+        return None
+    cache = _pipeline_caches.get(connection.alias)
+    if cache is None or cache.maxsize != maxsize:
+        with _pipeline_caches_lock:
+            cache = _pipeline_caches.get(connection.alias)
+            if cache is None or cache.maxsize != maxsize:
+                cache = _pipeline_caches[connection.alias] = PipelineCache(maxsize)
+    return cache
@@ -2,10 +2,54 @@ import abc
 from abc import ABC, abstractmethod
 from collections import OrderedDict
 
-from django.contrib.postgres.search import SearchQuery, SearchVector, SearchVectorExact
-from django.db.models import Count
-from django.db.models.expressions import BaseExpression, Col, Expression, Value
+from django.contrib.postgres.search import (
+    CombinedSearchVector,
+    SearchConfig,
+    SearchQuery,
+    SearchVector,
+    SearchVectorExact,
+)
+from django.core.exceptions import FieldError
+from django.db.models import (
+    Aggregate,
+    Avg,
+    Count,
+    IntegerField,
+    Max,
+    Min,
+    StdDev,
+    Sum,
+    Variance,
+)
+from django.db.models.expressions import (
+    BaseExpression,
+    Case,
+    Col,
+    Combinable,
+    CombinedExpression,
+    DurationExpression,
+    Exists,
+    Expression,
+    NegatedExpression,
+    Ref,
+    Star,
+    Subquery,
+    Value,
+)
+from django.db.models.fields.json import (
+    HasKey,
+    KeyTransform,
+    KeyTransformExact,
+    KeyTransformGt,
+    KeyTransformGte,
+    KeyTransformIn,
+    KeyTransformIsNull,
+    KeyTransformLt,
+    KeyTransformLte,
+)
 from django.db.models.fields.related_lookups import RelatedExact, RelatedIn
+from django.db.models.functions import Coalesce, Concat, Greatest, Least
+from django.db.models.functions.text import ConcatPair
 from django.db.models.lookups import (
     Exact,
     GreaterThan,
@@ -24,7 +68,7 @@ from django.db.models.lookups import (
 from django.db.models.sql import Query
 from django.db.models.sql.where import NothingNode, WhereNode
 
-from django_mongodb.expressions import RawMongoDBQuery
+from django_mongodb.expressions import RawMongoDBQuery, SearchScore
 
 
 class RequiresSearchException(Exception):
@@ -35,6 +79,45 @@ class RequiresSearchIndex(Exception):
     pass
 
 
+# $text index weights of the SearchVector weights, in the ratio of the PostgreSQL defaults
+TEXT_INDEX_WEIGHTS = {"A": 10, "B": 4, "C": 2, "D": 1}
+
+
+def get_text_search_vector(model) -> SearchVector | None:
+    """Search vector of the $text index of the model (MongoMeta.text_search_vector)"""
+    return getattr(getattr(model, "MongoMeta", None), "text_search_vector", None)
+
+
+def has_text_search(query) -> bool:
+    """Whether a query filter contains a $text query"""
+    if isinstance(query, dict):
+        return "$text" in query or any(has_text_search(value) for value in query.values())
+    if isinstance(query, list):
+        return any(has_text_search(item) for item in query)
+    return False
+
+
+def get_text_index(vector: SearchVector, opts) -> tuple[dict, str | None]:
+    """
+    Weights by column and the default language of the $text index of a (combined) search
+    vector, taken from the weight and config of its vectors.
+    """
+    weights = {}
+    language = None
+    vectors = [vector]
+    while vectors:
+        vector = vectors.pop(0)
+        if vector.config is not None and language is None:
+            language = vector.config.config.value
+        if isinstance(vector, CombinedSearchVector):
+            vectors.extend([vector.lhs, vector.rhs])
+            continue
+        weight = TEXT_INDEX_WEIGHTS[vector.weight.value if vector.weight is not None else "D"]
+        for expression in vector.get_source_expressions():
+            weights[opts.get_field(expression.name).column] = weight
+    return weights, language
+
+
 class Node(ABC):
     def __init__(self, node: Expression, mongo_meta):
         self.node = node
@@ -43,6 +126,22 @@ class Node(ABC):
     def requires_search(self) -> bool:
         return False
 
+    def can_search(self) -> bool:
+        """Whether the node is applied by the $search stage, instead of a $match stage"""
+        return False
+
+    def is_search_filter(self) -> bool:
+        """Whether the search clause of the node filters only, without affecting the score"""
+        return True
+
+    def get_shape(self) -> tuple | None:
+        """Structure of the node without its values, None if the node can't be cached."""
+        return None
+
+    def get_params(self, connection) -> list:
+        """Values of the node, in the order they are bound by `get_mongo_query`."""
+        return []
+
     @abc.abstractmethod
     def get_mongo_query(self, compiler, connection, requires_search=...) -> dict: ...
 
@@ -56,37 +155,113 @@ class RawMongoQueryExpression(Node):
         self.node = node
 
     def get_mongo_query(self, compiler, connection, is_search=False) -> dict:
-        return self.node.query
+        if not self.node.query:
+            return {}
+        return compiler.param(self.node.query)
 
     def get_mongo_search(self, compiler, connection) -> dict:
         return {}
 
+    def get_shape(self) -> tuple | None:
+        return (type(self).__name__, bool(self.node.query))
+
+    def get_params(self, connection) -> list:
+        return [self.node.query] if self.node.query else []
+
 
 class MongoLookup(Node):
     """MongoDB Query Node"""
 
     filter_operator: str
+    # search index types (of MongoMeta.search_fields), the lookup can be searched on
+    search_types = frozenset()
 
     def __init__(self, node: Lookup, mongo_meta):
         super().__init__(node, mongo_meta)
         self.lhs = node.get_prep_lhs()
         self.rhs = node.get_prep_lookup()
-        if hasattr(self.node, "rhs") and isinstance(self.node.rhs, BaseExpression):
+        if isinstance(self.rhs, Subquery):
+            self.rhs = self.rhs.query
+        if isinstance(self.rhs, BaseExpression) and not isinstance(self.rhs, Col | Query):
             raise NotImplementedError(f"Subquery Expression not implemented: {str(self.node.rhs)}")
 
+    @property
+    def rhs_is_expression(self):
+        """Whether the rhs is a column (of this or the outer query) or a subquery"""
+        return isinstance(self.rhs, Col | Query)
+
+    @property
+    def target(self):
+        """Field of the lhs, used for value conversion"""
+        return self.lhs.target if hasattr(self.lhs, "target") else self.lhs.output_field
+
+    @property
+    def attname(self):
+        return getattr(self.target, "attname", None)
+
+    @property
+    def column(self):
+        """Document key the lookup applies to, a dotted path for JSON key transforms"""
+        lhs = self.lhs
+        keys = []
+        while isinstance(lhs, KeyTransform):
+            keys.insert(0, str(lhs.key_name))
+            lhs = lhs.lhs
+        return ".".join([self.get_column(lhs), *keys])
+
+    def get_column(self, lhs):
+        grouped = self.mongo_meta.get("grouped", False)
+        if hasattr(lhs, "target"):
+            if grouped:
+                return lhs.target.attname
+            # columns of joined collections are embedded by their $lookup stage
+            path = self.mongo_meta.get("join_paths", {}).get(getattr(lhs, "alias", None), "")
+            return f"{path}{lhs.target.column}"
+        if isinstance(lhs, Ref):
+            return lhs.refs
+        for alias, annotation in self.mongo_meta.get("annotations", {}).items():
+            if annotation == lhs:
+                return alias
+        raise NotImplementedError(f"Lookup not implemented for expression: {lhs}")
+
+    @property
+    def search_field_types(self):
+        return self.mongo_meta["search_fields"].get(self.attname) or ()
+
+    def can_search(self) -> bool:
+        # key transforms and columns of other collections aren't in the search index
+        return (
+            isinstance(self.lhs, Col)
+            and not self.rhs_is_expression
+            and self.rhs is not None
+            and not self.search_types.isdisjoint(self.search_field_types)
+        )
+
     def get_mongo_query(self, compiler, connection, is_search=False) -> dict:
-        if self.lhs.target.attname in self.mongo_meta["search_fields"] and is_search:
+        if is_search and self.can_search():
             return {}
+        if self.rhs_is_expression:
+            return self.get_mongo_expr(compiler, connection)
+        return self._get_mongo_query(compiler, connection)
+
+    def get_mongo_expr(self, compiler, connection) -> dict:
+        """Compare to a column, or to the values of a subquery looked up by the compiler"""
+        if isinstance(self.rhs, Col):
+            rhs = compiler.get_column_ref(self.rhs)
         else:
-            return self._get_mongo_query(compiler, connection)
+            field, key = compiler.add_subquery(self.rhs)
+            rhs = f"${field}.{key}"
+            if self.filter_operator != "$in":
+                rhs = {"$first": rhs}
+        return {"$expr": {self.filter_operator: [f"${self.column}", rhs]}}
 
     def _get_mongo_query(self, compiler, connection, is_search=False) -> dict:
-        if self.lhs.target.attname in self.mongo_meta["search_fields"] and is_search:
-            return {}
-        lhs = self.lhs.target
+        rhs = compiler.param(self.get_db_rhs(connection))
+        return {self.column: {self.filter_operator: rhs}}
+
+    def get_db_rhs(self, connection):
+        lhs = self.target
         rhs = self.rhs
-        if is_search and self.mongo_meta["search_fields"].get(lhs.attname):
-            return {}
         # Convert the rhs value using the field's database conversion method
         if hasattr(lhs, "get_db_prep_value"):
             # For In lookups, rhs is a list and we need to convert each item
@@ -94,15 +269,20 @@ class MongoLookup(Node):
                 rhs = [lhs.get_db_prep_value(item, connection) for item in rhs]
             else:
                 rhs = lhs.get_db_prep_value(rhs, connection)
-        return {lhs.column: {self.filter_operator: rhs}}
+        return rhs
+
+    def get_shape(self) -> tuple | None:
+        if self.rhs_is_expression:
+            return None
+        return (type(self).__name__, self.filter_operator, self.column)
+
+    def get_params(self, connection) -> list:
+        return [self.get_db_rhs(connection)]
 
     def get_mongo_search(self, compiler, connection) -> dict:
-        if self.lhs.target.attname not in self.mongo_meta["search_fields"]:
-            return {}
-        if not self.rhs:
+        if not self.can_search():
             return {}
-        else:
-            return self._get_mongo_search(compiler, connection)
+        return self._get_mongo_search(compiler, connection)
 
     @abc.abstractmethod
     def _get_mongo_search(self, compiler, connection) -> dict: ...
@@ -112,38 +292,30 @@ class MongoExact(MongoLookup):
     """MongoDB Query Node for Exact"""
 
     filter_operator = "$eq"
+    search_types = frozenset({"string", "token", "number", "date", "objectId", "boolean", "uuid"})
 
-    def get_search_types(self, attname):
-        if attname in self.mongo_meta["search_fields"]:
-            if "string" in self.mongo_meta["search_fields"][attname]:
-                return "text", "query"
-            else:
-                return "equals", "value"
+    def is_search_filter(self) -> bool:
+        # only analyzed strings (without a token index) are matched by a scored text query
+        types = self.search_field_types
+        return not self.can_search() or "token" in types or "string" not in types
 
     def _get_mongo_search(self, compiler, connection) -> dict:
-        if self.lhs.target.attname not in self.mongo_meta["search_fields"]:
-            return {}
-        query, value = self.get_search_types(self.lhs.target.attname)
-        return {
-            query: {
-                "path": self.lhs.target.column,
-                value: self.rhs,
-            }
-        }
+        if not self.is_search_filter():
+            return {"text": {"path": self.column, "query": self.rhs}}
+        return {"equals": {"path": self.column, "value": self.get_db_rhs(connection)}}
 
 
 class MongoIn(MongoLookup):
     """MongoDB Query Node for RelatedIn"""
 
     filter_operator = "$in"
+    search_types = frozenset({"token", "number", "date", "objectId", "boolean", "uuid"})
 
     def _get_mongo_search(self, compiler, connection) -> dict:
-        if self.lhs.target.attname not in self.mongo_meta["search_fields"]:
-            return {}
         return {
             "in": {
-                "path": self.lhs.target.column,
-                "value": self.rhs,
+                "path": self.column,
+                "value": self.get_db_rhs(connection),
             }
         }
 
@@ -156,6 +328,7 @@ class MongoEqualityComparison(MongoLookup):
     """MongoDB Query Node for LessThanOrEqual"""
 
     filter_operator: str
+    search_types = frozenset({"token", "number", "date", "objectId"})
 
     def __init__(
         self,
@@ -172,36 +345,69 @@ class MongoEqualityComparison(MongoLookup):
         self.filter_operator = {
             IntegerLessThan: "$lt",
             LessThan: "$lt",
-            IntegerLessThanOrEqual: "$lt",
+            IntegerLessThanOrEqual: "$lte",
             LessThanOrEqual: "$lte",
             IntegerGreaterThan: "$gt",
             GreaterThan: "$gt",
             IntegerGreaterThanOrEqual: "$gte",
             GreaterThanOrEqual: "$gte",
+            KeyTransformLt: "$lt",
+            KeyTransformLte: "$lte",
+            KeyTransformGt: "$gt",
+            KeyTransformGte: "$gte",
         }[type(operator)]
 
     def _get_mongo_search(self, compiler, connection) -> dict:
         return {
             "range": {
-                "path": self.lhs.target.column,
-                self.filter_operator[1:-1]: self.rhs,
+                "path": self.column,
+                self.filter_operator[1:]: self.get_db_rhs(connection),
             }
         }
 
 
 class MongoIsNull(MongoLookup):
     def _get_mongo_query(self, compiler, connection, is_search=False) -> dict:
-        return {self.lhs.target.column: None if self.rhs else {"$ne": None}}
+        return {self.column: None if self.rhs else {"$ne": None}}
+
+    def get_shape(self) -> tuple | None:
+        return (type(self).__name__, self.column, bool(self.rhs))
+
+    def get_params(self, connection) -> list:
+        return []
 
     def _get_mongo_search(self, compiler, connection) -> dict:
-        if self.lhs.target.attname not in self.mongo_meta["search_fields"]:
-            return {}
-        return {
-            "exists": {
-                "path": self.lhs.target.column,
-                "value": self.rhs,
-            }
-        }
+        # not searched, the exists operator of search doesn't distinguish null values
+        return {}
+
+
+class MongoKeyTransformIsNull(MongoIsNull):
+    """MongoDB Query Node for KeyTransformIsNull, which tests the existence of the key"""
+
+    def _get_mongo_query(self, compiler, connection, is_search=False) -> dict:
+        return {self.column: {"$exists": not self.rhs}}
+
+
+class MongoHasKey(MongoLookup):
+    """MongoDB Query Node for HasKey"""
+
+    filter_operator = "$exists"
+
+    @property
+    def column(self):
+        return f"{super().column}.{self.rhs}"
+
+    def _get_mongo_query(self, compiler, connection, is_search=False) -> dict:
+        return {self.column: {"$exists": True}}
+
+    def get_shape(self) -> tuple | None:
+        return (type(self).__name__, self.column)
+
+    def get_params(self, connection) -> list:
+        return []
+
+    def _get_mongo_search(self, compiler, connection) -> dict:
+        return {}
 
 
 class SearchNode(Node):
@@ -213,6 +419,12 @@ class SearchNode(Node):
     def requires_search(self) -> bool:
         return True
 
+    def can_search(self) -> bool:
+        return True
+
+    def is_search_filter(self) -> bool:
+        return False
+
     def get_mongo_query(self, compiler, connection, is_search=False) -> dict:
         if not is_search:
             raise RequiresSearchException("SearchNode requires application in search pipeline.")
@@ -236,7 +448,40 @@ class MongoSearchLookup(SearchNode):
 
 
 class MongoSearchVectorExact(MongoSearchLookup):
-    """Maps search vector to basic MongoDB wildcard query"""
+    """
+    Maps search vector to basic MongoDB wildcard query, or to a $text query of the local text
+    index (MongoMeta.text_search_vector)
+    """
+
+    def get_mongo_query(self, compiler, connection, is_search=False) -> dict:
+        if self.mongo_meta.get("text_search_vector") is None:
+            return super().get_mongo_query(compiler, connection, is_search=is_search)
+        return self._get_mongo_text(compiler, connection)
+
+    def _get_mongo_text(self, compiler, connection) -> dict:
+        weights, language = get_text_index(
+            self.mongo_meta["text_search_vector"], compiler.query.get_meta()
+        )
+        columns = {expression.field.column for expression in self.lhs.get_source_expressions()}
+        if columns - set(weights):
+            raise RequiresSearchIndex(
+                "SearchVectorExact requires a text index for the fields used in the search."
+            )
+        if self.rhs.invert:
+            raise NotImplementedError("Inverted search queries are not supported by $text.")
+        query = " ".join(
+            expression.value
+            for expression in self.rhs.get_source_expressions()
+            if not isinstance(expression, SearchConfig)
+        )
+        if self.rhs.function == SearchQuery.SEARCH_TYPES["phrase"]:
+            query = f'"{query}"'
+        text = {"$search": query}
+        for config in (self.rhs.config, self.lhs.config):
+            if config is not None:
+                text["$language"] = config.config.value
+                break
+        return {"$text": text}
 
     def _get_mongo_search(self, compiler, connection) -> dict:
         rhs_expressions = self.lhs.get_source_expressions()
@@ -282,6 +527,33 @@ class MongoSearchVectorExact(MongoSearchLookup):
         return search_query
 
 
+class MongoExists(Node):
+    """MongoDB Query Node for (negated) Exists, the subquery is looked up by the compiler"""
+
+    def __init__(self, node: Exact, mongo_meta):
+        super().__init__(node, mongo_meta)
+        exists = node.lhs
+        self.negated = not node.rhs
+        if isinstance(exists, NegatedExpression):
+            exists = exists.expression
+            self.negated = not self.negated
+        self.negated ^= getattr(exists, "negated", False)
+        self.query = exists.query
+
+    def get_mongo_query(self, compiler, connection, is_search=False) -> dict:
+        field, _ = compiler.add_subquery(self.query)
+        return {field: {"$eq": []} if self.negated else {"$ne": []}}
+
+    def get_mongo_search(self, compiler, connection) -> dict:
+        return {}
+
+
+def _is_exists(expression) -> bool:
+    if isinstance(expression, NegatedExpression):
+        expression = expression.expression
+    return isinstance(expression, Exists)
+
+
 class MongoNothingNode(Node):
     def get_mongo_query(self, compiler, connection, is_search=...) -> dict:
         return {"$expr": {"$eq": [True, False]}}
@@ -289,6 +561,9 @@ class MongoNothingNode(Node):
     def get_mongo_search(self, compiler, connection) -> dict:
         return {}
 
+    def get_shape(self) -> tuple | None:
+        return (type(self).__name__,)
+
 
 class MongoWhereNode:
     """MongoDB Query Node for WhereNode"""
@@ -311,6 +586,14 @@ class MongoWhereNode:
         SearchVectorExact: MongoSearchVectorExact,
         RawMongoDBQuery: RawMongoQueryExpression,
         IsNull: MongoIsNull,
+        KeyTransformExact: MongoExact,
+        KeyTransformIn: MongoIn,
+        KeyTransformLt: MongoEqualityComparison,
+        KeyTransformLte: MongoEqualityComparison,
+        KeyTransformGt: MongoEqualityComparison,
+        KeyTransformGte: MongoEqualityComparison,
+        KeyTransformIsNull: MongoKeyTransformIsNull,
+        HasKey: MongoHasKey,
     }
 
     def __init__(self, where: WhereNode, mongo_meta):
@@ -324,6 +607,8 @@ class MongoWhereNode:
                 self.children.append(MongoWhereNode(child, self.mongo_meta))
             elif isinstance(child, Exact) and isinstance(child.lhs, RawMongoDBQuery):
                 self.children.append(RawMongoQueryExpression(child.lhs, self.mongo_meta))
+            elif isinstance(child, Exact) and _is_exists(child.lhs):
+                self.children.append(MongoExists(child, self.mongo_meta))
             elif child.__class__ in self.node_map:
                 self.children.append(self.node_map[child.__class__](child, self.mongo_meta))
             else:
@@ -335,7 +620,26 @@ class MongoWhereNode:
     def requires_search(self) -> bool:
         return any(child.requires_search() for child in self.children)
 
+    def can_search(self) -> bool:
+        return not self.negated and all(child.can_search() for child in self.children)
+
+    def is_search_filter(self) -> bool:
+        return all(child.is_search_filter() for child in self.children)
+
+    def get_shape(self) -> tuple | None:
+        child_shapes = tuple(child.get_shape() for child in self.children)
+        if None in child_shapes:
+            return None
+        return (self.connector, self.negated, child_shapes)
+
+    def get_params(self, connection) -> list:
+        return [param for child in self.children for param in child.get_params(connection)]
+
     def get_mongo_query(self, compiler, connection, is_search=False) -> dict:
+        # the searched children of conjunctions are skipped, other nodes are matched entirely
+        is_search = is_search and (
+            self.can_search() or (self.connector == "AND" and not self.negated)
+        )
         child_queries = list(
             filter(
                 bool,
@@ -347,6 +651,8 @@ class MongoWhereNode:
         )
         if len(child_queries) == 0:
             return {}
+        if self.negated and has_text_search(child_queries):
+            raise NotImplementedError("Negated search queries are not supported by $text.")
         if self.connector == "AND":
             return {"$and": child_queries} if not self.negated else {"$nor": child_queries}
         elif self.connector == "OR":
@@ -355,30 +661,165 @@ class MongoWhereNode:
             raise Exception(f"Unsupported connector: {self.connector}")
 
     def get_mongo_search(self, compiler, connection) -> dict:
-        child_queries = list(
-            filter(
-                bool,
-                [child.get_mongo_search(compiler, connection) for child in self.children],
-            )
-        )
+        if self.negated or (self.connector != "AND" and not self.can_search()):
+            return {}
+        child_queries = [
+            (query, child.is_search_filter())
+            for child in self.children
+            if (query := child.get_mongo_search(compiler, connection))
+        ]
         if len(child_queries) == 0:
             return {}
         elif self.connector == "AND":
-            return {"compound": {"must": child_queries}}
+            # filter clauses don't affect the score of the results
+            compound = {}
+            if must := [query for query, is_filter in child_queries if not is_filter]:
+                compound["must"] = must
+            if filters := [query for query, is_filter in child_queries if is_filter]:
+                compound["filter"] = filters
+            return {"compound": compound}
         elif self.connector == "OR":
-            return {"compound": {"should": child_queries}}
+            return {"compound": {"should": [query for query, _ in child_queries]}}
         else:
             raise Exception(f"Unsupported connector: {self.connector}")
 
 
+# comparison operators of expressions, which match null and missing values
+NULL_MATCHING_OPERATORS = frozenset(("$lt", "$lte", "$ne"))
+
+
+def query_to_expression(query: dict):
+    """Translate a query filter, as built by MongoWhereNode, to an aggregation expression."""
+    expressions = []
+    for key, value in query.items():
+        match key:
+            case "$and" | "$or":
+                expressions.append({key: [query_to_expression(item) for item in value]})
+            case "$nor":
+                expressions.append({"$not": [{"$or": [query_to_expression(v) for v in value]}]})
+            case "$expr":
+                expressions.append(value)
+            case _ if key.startswith("$"):
+                raise NotImplementedError(f"Query operator not supported in expressions: {key}")
+            case _ if value is None:
+                expressions.append({"$eq": [{"$ifNull": [f"${key}", None]}, None]})
+            case _ if isinstance(value, dict) and value == {"$ne": None}:
+                expressions.append({"$ne": [{"$ifNull": [f"${key}", None]}, None]})
+            case _ if isinstance(value, dict):
+                expressions.extend(
+                    {operator: [f"${key}", operand]} for operator, operand in value.items()
+                )
+                if not NULL_MATCHING_OPERATORS.isdisjoint(value):
+                    # null and missing values sort before all others, unlike in a query filter
+                    # (and SQL) they would match these comparisons
+                    expressions.append({"$gt": [f"${key}", None]})
+            case _:
+                expressions.append({"$eq": [f"${key}", value]})
+    return expressions[0] if len(expressions) == 1 else {"$and": expressions}
+
+
+arithmetic_operators = {
+    Combinable.ADD: "$add",
+    Combinable.SUB: "$subtract",
+    Combinable.MUL: "$multiply",
+    Combinable.DIV: "$divide",
+    Combinable.MOD: "$mod",
+    Combinable.POW: "$pow",
+}
+
+
+def expression_to_mongo(expression, compiler, connection):  # noqa: C901
+    """Translate a resolved expression to an aggregation expression."""
+
+    def translate(expressions):
+        return [expression_to_mongo(source, compiler, connection) for source in expressions]
+
+    match expression:
+        case Col():
+            return compiler.get_column_ref(expression)
+        case Value():
+            try:
+                value = expression.output_field.get_db_prep_value(expression.value, connection)
+            except FieldError:
+                value = expression.value
+            return {"$literal": value}
+        case DurationExpression() if expression.connector in (Combinable.ADD, Combinable.SUB):
+            # durations are stored in microseconds, dates are shifted by milliseconds
+            sources = []
+            for source in (expression.lhs, expression.rhs):
+                value = expression_to_mongo(source, compiler, connection)
+                if source.output_field.get_internal_type() == "DurationField":
+                    value = {"$divide": [value, 1000]}
+                sources.append(value)
+            return {arithmetic_operators[expression.connector]: sources}
+        case CombinedExpression() if expression.connector in arithmetic_operators:
+            operator = arithmetic_operators[expression.connector]
+            result = {operator: translate([expression.lhs, expression.rhs])}
+            if operator == "$divide" and isinstance(expression.output_field, IntegerField):
+                # integer division, as in SQL
+                result = {"$trunc": [result, 0]}
+            return result
+        case Greatest():
+            return {"$max": translate(expression.get_source_expressions())}
+        case Least():
+            return {"$min": translate(expression.get_source_expressions())}
+        case Coalesce():
+            return {"$ifNull": translate(expression.get_source_expressions())}
+        case Concat():
+            return expression_to_mongo(expression.get_source_expressions()[0], compiler, connection)
+        case ConcatPair():
+            # null values are concatenated as empty strings
+            return {
+                "$concat": [
+                    {"$ifNull": [source, ""]}
+                    for source in translate(expression.get_source_expressions())
+                ]
+            }
+        case Case():
+            branches = []
+            for when in expression.cases:
+                condition = when.condition
+                if not isinstance(condition, WhereNode):
+                    condition = WhereNode([condition])
+                condition = MongoWhereNode(condition, compiler.mongo_meta).get_mongo_query(
+                    compiler, connection
+                )
+                branches.append(
+                    {
+                        "case": query_to_expression(condition),
+                        "then": expression_to_mongo(when.result, compiler, connection),
+                    }
+                )
+            default = expression_to_mongo(expression.default, compiler, connection)
+            return {"$switch": {"branches": branches, "default": default}}
+        case _:
+            raise NotImplementedError(f"Expression not implemented: {expression}")
+
+
+def _is_aggregate_with_default(expression: Coalesce) -> bool:
+    # Aggregate(default=...) is resolved to Coalesce(Aggregate, Value)
+    sources = expression.get_source_expressions()
+    return len(sources) == 2 and isinstance(sources[0], Aggregate) and isinstance(sources[1], Value)
+
+
 class MongoColSelect:
     def __init__(self, col: Col, alias: str | None, mongo_meta):
         self.col = col
         self.mongo_meta = mongo_meta
         self.alias = alias
 
-    def get_mongo(self):
-        return {"$project": {(self.alias or self.col.target.attname): f"${self.col.target.column}"}}
+    def get_mongo(self, compiler, connection):
+        key = compiler.get_column_key(self.col, self.alias)
+        return {"$project": {key: f"${compiler.get_column_path(self.col)}"}}
+
+    def get_shape(self):
+        return (
+            type(self).__name__,
+            self.alias,
+            self.col.alias,
+            self.col.target.attname,
+            self.col.target.column,
+        )
 
 
 class MongoValueSelect:
@@ -387,25 +828,119 @@ class MongoValueSelect:
         self.mongo_meta = mongo_meta
         self.alias = alias
 
-    def get_mongo(self):
+    def get_mongo(self, compiler, connection):
         return {"$project": {(self.alias): self.col.value}}
 
+    def get_shape(self):
+        return (type(self).__name__, self.alias, repr(self.col.value))
 
-class MongoCountSelect:
-    def __init__(self, col: Count, alias: str | None, mongo_meta):
+
+class MongoSearchScoreSelect:
+    def __init__(self, col: SearchScore, alias: str | None, mongo_meta):
         self.col = col
         self.mongo_meta = mongo_meta
         self.alias = alias
 
-    def get_mongo(self):
+    def get_mongo(self, compiler, connection):
+        # the score of the local text index, if the model has one
+        meta = "searchScore" if self.mongo_meta.get("text_search_vector") is None else "textScore"
+        return {"$project": {self.alias: {"$meta": meta}}}
+
+    def get_shape(self):
+        return (type(self).__name__, self.alias)
+
+
+class MongoAggregateSelect:
+    """Aggregate computed by an accumulator of the $group stage"""
+
+    accumulators = {
+        Count: "$sum",
+        Sum: "$sum",
+        Avg: "$avg",
+        Min: "$min",
+        Max: "$max",
+        StdDev: "$stdDev",
+        Variance: "$stdDev",
+    }
+
+    def __init__(self, col: Aggregate, alias: str | None, mongo_meta, default=None):
+        if type(col) not in self.accumulators:
+            raise NotImplementedError(f"Aggregate not implemented: {col}")
+        self.col = col
+        self.mongo_meta = mongo_meta
+        self.alias = alias or col.output_field.column
+        self.default = default
+        self.key = f"__{self.alias}"
+
+    def _get_source(self, compiler, connection):
+        source = self.col.get_source_expressions()[0]
+        match source:
+            case Star():
+                value = 1
+            case Col() if (
+                isinstance(self.col, Count)
+                and source.target.primary_key
+                and compiler.get_column_path(source) == source.target.column
+            ):
+                # every row has the primary key of the queried collection, the keys of outer
+                # joined documents are counted if they are not null
+                value = 1
+            case Col():
+                value = f"${compiler.get_column_path(source)}"
+            case Value():
+                value = source.value
+            case _:
+                raise NotImplementedError(f"Aggregate source expression not implemented: {source}")
+        if self.col.filter:
+            condition = MongoWhereNode(self.col.filter, self.mongo_meta).get_mongo_query(
+                compiler, connection
+            )
+            value = {"$cond": [query_to_expression(condition), value, None]}
+        return value
+
+    def _get_accumulator(self):
+        accumulator = self.accumulators[type(self.col)]
+        if accumulator == "$stdDev":
+            return "$stdDevSamp" if self.col.function.endswith("SAMP") else "$stdDevPop"
+        return accumulator
+
+    def get_mongo(self, compiler, connection):
+        value = self._get_source(compiler, connection)
+        accumulator = self._get_accumulator()
+        if self.col.distinct:
+            # collect the distinct values, the aggregate is applied to the set afterward
+            group = {"$addToSet": value}
+            values = {"$setDifference": [f"${self.key}", [None]]}
+            result = {"$size": values} if isinstance(self.col, Count) else {accumulator: values}
+        elif isinstance(self.col, Count):
+            is_counted = {"$ne": [{"$ifNull": [value, None]}, None]}
+            group = {"$sum": 1 if value == 1 else {"$cond": [is_counted, 1, 0]}}
+            result = f"${self.key}"
+        else:
+            group = {accumulator: value}
+            result = f"${self.key}"
+        if isinstance(self.col, Variance):
+            result = {"$pow": [result, 2]}
+        if self.default is not None:
+            result = {"$ifNull": [result, self.default]}
         return {
-            "$group": {"_id": None, "_count": {"$sum": 1}},
-            "$project": {
-                "_id": None,
-                (self.alias or self.col.output_field.column): "$_count",
-            },
+            "$group": {"_id": None, self.key: group},
+            "$project": {"_id": None, self.alias: result},
         }
 
+    def get_shape(self):
+        if self.col.filter:
+            return None
+        return (
+            type(self).__name__,
+            type(self.col).__name__,
+            self.col.function,
+            self.col.distinct,
+            self.alias,
+            repr(self.col.get_source_expressions()[0]),
+            repr(self.default),
+        )
+
 
 class MongoSelect:
     def __init__(self, _cols: list[tuple[Expression, tuple, str | None]], mongo_meta):
@@ -418,24 +953,55 @@ class MongoSelect:
                     self.cols.append(MongoColSelect(column, alias, mongo_meta))
                 case Value():
                     self.cols.append(MongoValueSelect(column, alias, mongo_meta))
-                case Count():
-                    self.cols.append(MongoCountSelect(column, alias, mongo_meta))
+                case SearchScore():
+                    self.cols.append(MongoSearchScoreSelect(column, alias, mongo_meta))
+                case Aggregate():
+                    self.cols.append(MongoAggregateSelect(column, alias, mongo_meta))
+                case Coalesce() if _is_aggregate_with_default(column):
+                    aggregate, default = column.get_source_expressions()
+                    self.cols.append(
+                        MongoAggregateSelect(aggregate, alias, mongo_meta, default.value)
+                    )
                 case SearchVector():
                     pass  # ignoring search vector in results
                 case _:
                     raise NotImplementedError(f"Select expression not implemented: {col}")
 
-    def get_mongo(self):
+    def get_grouped_mongo(self, compiler, connection, group_by: list[Col]):
+        """$group by the compound key of the group_by columns, projected back to the row layout"""
+        group = {
+            "_id": {col.target.attname: f"${compiler.get_column_path(col)}" for col in group_by}
+        }
+        project = {"_id": 0}
+        for col in self.cols:
+            match col:
+                case MongoAggregateSelect():
+                    mongo_query = col.get_mongo(compiler, connection)
+                    group[col.key] = mongo_query["$group"][col.key]
+                    project[col.alias] = mongo_query["$project"][col.alias]
+                case MongoColSelect() if col.col.target.attname in group["_id"]:
+                    project[col.alias or col.col.target.attname] = f"$_id.{col.col.target.attname}"
+                case MongoValueSelect():
+                    project[col.alias] = {"$literal": col.col.value}
+                case _:
+                    raise NotImplementedError(f"Select expression not grouped: {col.col}")
+        return [{"$group": group}, {"$project": project}]
+
+    def get_mongo(self, compiler, connection):
         pipeline_dict: dict[str, dict] = OrderedDict()
         pipeline_dict["$group"] = dict()
         pipeline_dict["$project"] = dict()
         for col in self.cols:
-            mongo_query = col.get_mongo()
+            mongo_query = col.get_mongo(compiler, connection)
             for key, item in mongo_query.items():
                 pipeline_dict[key].update(item)
 
         return [{key: item} for key, item in pipeline_dict.items() if item]
 
+    def get_shape(self):
+        shapes = tuple(col.get_shape() for col in self.cols)
+        return None if None in shapes else shapes
+
 
 class MongoOrdering:
     """MongoDB Query Node for Ordering"""
@@ -444,6 +1010,14 @@ class MongoOrdering:
         self.query = query
         self.order = query.order_by
 
+    def get_mongo_search_sort(self):
+        """Sort option of the $search stage, in which the search score can be sorted by"""
+        sort = self.get_mongo_order()
+        for alias, ordering in sort.items():
+            if isinstance(self.query.annotations.get(alias), SearchScore):
+                sort[alias] = {"$meta": "searchScore", "order": ordering}
+        return sort
+
     def get_mongo_order(self, attname_as_key=False):
         key = "attname" if attname_as_key else "column"
         mongo_order = {}
@@ -456,5 +1030,19 @@ class MongoOrdering:
             else:
                 ordering = 1
             field = meta.pk.attname if field == "pk" else field
+            if field in self.query.annotation_select:
+                annotation = self.query.annotations[field]
+                text_search = get_text_search_vector(self.query.model) is not None
+                if isinstance(annotation, SearchScore) and text_search:
+                    # text scores can only be sorted by descending score
+                    if ordering == 1:
+                        raise NotImplementedError(
+                            "$text results can only be ordered by descending score."
+                        )
+                    mongo_order.update({field: {"$meta": "textScore"}})
+                    continue
+                # annotations are projected by their alias
+                mongo_order.update({field: ordering})
+                continue
             mongo_order.update({getattr(fields[field], key): ordering})
         return mongo_order
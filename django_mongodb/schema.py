@@ -1,5 +1,7 @@
 from django.db.backends.base.schema import BaseDatabaseSchemaEditor
 
+from django_mongodb.query import get_text_index, get_text_search_vector
+
 
 class DatabaseSchemaEditor(BaseDatabaseSchemaEditor):
     def quote_value(self, value):
@@ -23,7 +25,30 @@ class DatabaseSchemaEditor(BaseDatabaseSchemaEditor):
 
     def alter_unique_together(self, model, old_unique_together, new_unique_together): ...
 
-    def create_model(self, model): ...
+    def create_model(self, model):
+        self.create_text_index(model)
+
+    def create_text_index(self, model):
+        """
+        Create the $text index of the search vector of the model (MongoMeta.text_search_vector),
+        with the weights and the language of the vector.
+        """
+        if (vector := get_text_search_vector(model)) is None:
+            return
+        opts = model._meta
+        weights, language = get_text_index(vector, opts)
+        options = {"name": f"{opts.db_table}_text", "weights": weights}
+        if language is not None:
+            options["default_language"] = language
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                {
+                    "collection": opts.db_table,
+                    "op": "create_index",
+                    "keys": [(column, "text") for column in weights],
+                    "options": options,
+                }
+            )
 
     def delete_model(self, model): ...
 
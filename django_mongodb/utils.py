@@ -14,9 +14,12 @@ def _extract_username_password(url: str) -> tuple[str, str, str]:
 
 def sanitize_client_opts(client_opts):
     # Sanitize client options.
-    if "host" in client_opts:
+    if client_opts.get("host"):
         username, password, host = _extract_username_password(client_opts["host"])
-        client_opts["username"] = username
-        client_opts["password"] = password
+        # credentials already moved out of the url are kept, which makes this idempotent
+        if username or "username" not in client_opts:
+            client_opts["username"] = username
+        if password or "password" not in client_opts:
+            client_opts["password"] = password
         client_opts["host"] = host
     return client_opts
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("refapp", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="refmodel",
+            name="value",
+            field=models.IntegerField(null=True),
+        ),
+    ]
@@ -6,3 +6,4 @@ class RefModel(models.Model):
     json = models.JSONField(default=dict)
     description = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    value = models.IntegerField(null=True)
@@ -4,6 +4,7 @@ import pytest
 from django.db import connections
 from pymongo.operations import SearchIndexModel
 
+from django_mongodb.cursor import Cursor
 from testapp.models import FooModel
 
 
@@ -12,6 +13,20 @@ def clean_db():
     FooModel.objects.all().delete()
 
 
+@pytest.fixture()
+def mongo_commands(monkeypatch):
+    """Operations executed by the cursors during the test, in order"""
+    commands = []
+    execute = Cursor.execute
+
+    def spy_execute(self, command, *args, **kwargs):
+        commands.append(command)
+        return execute(self, command, *args, **kwargs)
+
+    monkeypatch.setattr(Cursor, "execute", spy_execute)
+    return commands
+
+
 @pytest.fixture()
 def search_index():
     # Ensure the collection exists by creating a dummy document and then deleting it
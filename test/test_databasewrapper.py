@@ -1,7 +1,11 @@
 import pytest
+from django.core.signals import request_finished
 from django.db import connections
 from pymongo.collection import Collection
 from pymongo.database import Database
+from pymongo.errors import InvalidOperation
+
+from testapp.models import FooModel
 
 
 @pytest.mark.django_db(databases=["mongodb"])
@@ -9,3 +13,89 @@ def test_cursor():
     with connections["mongodb"].cursor() as cursor:
         assert isinstance(cursor.collections, Database)
         assert isinstance(cursor.collections["foo"], Collection)
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_shared_mongo_client():
+    connection = connections["mongodb"]
+    connection.ensure_connection()
+    other = connection.copy()
+    other.ensure_connection()
+    try:
+        assert other.mongo_client is connection.mongo_client
+    finally:
+        other.close()
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_mongo_client_registry_fork_reset(monkeypatch):
+    from django_mongodb import base
+
+    # isolate the registry, the clients of the connections stay registered
+    monkeypatch.setattr(base, "_mongo_clients", {})
+    client_opts = {"host": "mongodb://localhost:27017", "connect": False}
+    client = base.get_mongo_client(client_opts)
+    assert base.get_mongo_client(dict(client_opts)) is client
+    # simulate running in a forked child
+    monkeypatch.setattr(base, "_mongo_clients_pid", -1)
+    try:
+        assert base.get_mongo_client(client_opts) is not client
+        # the inherited client is closed
+        with pytest.raises(InvalidOperation):
+            client.admin.command("ping")
+    finally:
+        base.close_mongo_clients()
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_after_fork_in_child(monkeypatch):
+    from django_mongodb import base
+
+    connection = connections["mongodb"]
+    connection.ensure_connection()
+    monkeypatch.setattr(base, "_mongo_clients", {})
+    client = base.get_mongo_client({"host": "mongodb://localhost:27017", "connect": False})
+    base._before_fork()
+    base._after_fork_in_child()
+    try:
+        assert not base._mongo_clients_lock.locked()
+        assert base._mongo_clients == {}
+        assert connection.connection is None
+        assert connection.mongo_client is None
+        with pytest.raises(InvalidOperation):
+            client.admin.command("ping")
+    finally:
+        # reconnect with the client of the process wide registry
+        connection.close()
+        base.close_mongo_clients()
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_session_strategies(monkeypatch):
+    from django_mongodb.base import session_counters
+
+    connection = connections["mongodb"]
+    connection.ensure_connection()
+    started, ended = session_counters["started"], session_counters["ended"]
+
+    monkeypatch.setitem(connection.settings_dict, "SESSION_STRATEGY", "none")
+    assert connection.cursor().cursor.session is None
+    assert session_counters["started"] == started
+
+    monkeypatch.setitem(connection.settings_dict, "SESSION_STRATEGY", "per-connection")
+    with connection.cursor(), connection.cursor():
+        pass
+    assert session_counters["started"] == started + 1
+    assert session_counters["ended"] == ended
+
+    monkeypatch.setitem(connection.settings_dict, "SESSION_STRATEGY", "per-request")
+    with connection.request_session():
+        list(FooModel.objects.all())
+        list(FooModel.objects.all())
+    assert session_counters["started"] == started + 1
+    assert session_counters["ended"] == ended + 1
+    assert connection.mongo_session is None
+
+    list(FooModel.objects.all())
+    request_finished.send(sender=None)
+    assert session_counters["started"] == session_counters["ended"] == started + 2
@@ -4,25 +4,51 @@ import time
 from datetime import timedelta
 from decimal import Decimal
 
+import bson
 import pytest
 from bson import ObjectId
 from bson.decimal128 import Decimal128
 from django.conf import settings
 from django.contrib.postgres.search import SearchQuery, SearchVector
-from django.db import models
+from django.core.paginator import EmptyPage, InvalidPage
+from django.db import DatabaseError, connections, models
+from django.db.models import (
+    Avg,
+    Case,
+    Count,
+    Exists,
+    F,
+    Max,
+    Min,
+    OuterRef,
+    Q,
+    StdDev,
+    Subquery,
+    Sum,
+    Variance,
+    When,
+)
+from django.db.models.functions import Coalesce, Concat, Greatest, Least
 from django.utils.timezone import now
 from pymongo import MongoClient
 
+from django_mongodb.compiler import SQLCompiler, SQLUpdateCompiler
 from django_mongodb.expressions import RawMongoDBQuery
-from django_mongodb.query import RequiresSearchIndex
+from django_mongodb.pagination import FacetPaginator, SeekPaginator
+from django_mongodb.pipeline_cache import get_pipeline_cache
+from django_mongodb.query import RequiresSearchIndex, query_to_expression
 from refapp.models import RefModel
 from testapp.models import (
     DecimalFieldModel,
     DifferentTableOneToOne,
+    DirtyFieldsModel,
     FooModel,
     RelatedModel,
     SameTableChild,
     SameTableOneToOne,
+    TextSearchModel,
+    UpsertChild,
+    UpsertModel,
 )
 
 
@@ -104,6 +130,20 @@ def test_mongo_int_isnull():
     assert len(list(FooModel.objects.exclude(name2__isnull=True))) == 0
 
 
+@pytest.mark.django_db(databases=["mongodb"])
+def test_mongo_int_range_lookups():
+    for i in range(4):
+        FooModel.objects.create(name=str(i), int_field=i, json_field={})
+
+    def names(**lookups):
+        return sorted(FooModel.objects.filter(**lookups).values_list("name", flat=True))
+
+    assert names(int_field__lte=2) == ["0", "1", "2"]
+    assert names(int_field__lt=2) == ["0", "1"]
+    assert names(int_field__gte=2) == ["2", "3"]
+    assert names(int_field__gt=2) == ["3"]
+
+
 @pytest.mark.django_db(databases=["mongodb"])
 def test_mongo_model_all_delete():
     FooModel.objects.create(
@@ -186,9 +226,17 @@ def test_mongo_different_collection_one_to_one_select():
     obj1.another_extends.save()
     obj2 = FooModel.objects.get(id=obj1.id)
     assert obj2.another_extends.extra == "extra"
-    with pytest.raises(NotImplementedError):
-        obj3 = FooModel.objects.select_related("another_extends").get(id=obj1.id)
-        assert obj3.another_extends.extra == "extra"
+    obj3 = FooModel.objects.select_related("another_extends").get(id=obj1.id)
+    assert obj3.another_extends.extra == "extra"
+    obj4 = DifferentTableOneToOne.objects.select_related("dummy_model").get(pk=obj1.id)
+    assert obj4.dummy_model.name == "test"
+
+    # reverse OneToOne relations are outer joins
+    FooModel.objects.create(name="no extends", json_field={})
+    obj5 = FooModel.objects.select_related("another_extends").get(name="no extends")
+    assert obj5._state.fields_cache["another_extends"] is None
+    with pytest.raises(DifferentTableOneToOne.DoesNotExist):
+        assert obj5.another_extends
 
 
 @pytest.mark.django_db(databases=["mongodb"])
@@ -250,7 +298,7 @@ def test_mongo_prohibit_nested_queries():
     RelatedModel.objects.create(name="related", foo=FooModel.objects.get(name="1"))
 
     with pytest.raises(NotImplementedError):
-        FooModel.objects.filter(related__name="related").delete()
+        FooModel.objects.exclude(related__name="related").delete()
 
 
 @pytest.mark.django_db(databases=["mongodb"])
@@ -574,3 +622,877 @@ def test_in_lookup_field_conversion():
     # Test with mixed types (should still work due to field conversion)
     result = DecimalFieldModel.objects.filter(value__in=[Decimal("10.50"), "20.75"])
     assert result.count() == 2
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_results_iter_is_lazy():
+    fetched_batches = []
+
+    def batches():
+        for i in range(3):
+            fetched_batches.append(i)
+            yield [{"name": str(i)}]
+
+    compiler = FooModel.objects.values_list("name").query.get_compiler("mongodb")
+    compiler.setup_query()
+    rows = compiler.results_iter(results=batches())
+    assert next(rows) == ("0",)
+    assert fetched_batches == [0]
+    assert list(rows) == [("1",), ("2",)]
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_mongo_iterator_chunk_size():
+    for i in range(5):
+        FooModel.objects.create(name=str(i), json_field={"foo": "bar"})
+    names = [item.name for item in FooModel.objects.order_by("name").iterator(chunk_size=2)]
+    assert names == ["0", "1", "2", "3", "4"]
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_converter_plan():
+    compiler = FooModel.objects.values_list(
+        "json_field", "name", "datetime_field"
+    ).query.get_compiler("mongodb")
+    compiler.setup_query()
+    converters = compiler.get_converters([col for col, _, _ in compiler.select])
+    # JSON is returned as native dict, CharField has no converters
+    plan = compiler.get_converter_plan(converters)
+    assert [pos for pos, _ in plan] == [2]
+    value = datetime.datetime(2024, 1, 1)
+    assert plan[0][1](value).tzinfo is not None
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_codec_decoding_equivalence(monkeypatch):
+    connection = connections["mongodb"]
+    ops = connection.ops
+    doc = {
+        "decimal": Decimal128("-123.45"),
+        "datetime": datetime.datetime(2024, 1, 1, 12, 30, 15),
+    }
+    decoded = bson.decode(bson.encode(doc), codec_options=ops.codec_options)
+    assert decoded["decimal"] == ops.convert_decimalfield_value(doc["decimal"], None, connection)
+    assert isinstance(decoded["decimal"], Decimal)
+    assert decoded["datetime"] == ops.convert_datetime_value(doc["datetime"], None, connection)
+    assert decoded["datetime"].tzinfo is not None
+
+    monkeypatch.setitem(connection.settings_dict, "CODEC_DECODING", True)
+    value_field = DecimalFieldModel._meta.get_field("value")
+    datetime_field = FooModel._meta.get_field("datetime_field")
+    assert ops.get_db_converters(value_field.get_col("t")) == []
+    assert ops.get_db_converters(datetime_field.get_col("t")) == []
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_pipeline_cache(monkeypatch):
+    connection = connections["mongodb"]
+    monkeypatch.setitem(connection.settings_dict, "PIPELINE_CACHE_SIZE", 2)
+    cache = get_pipeline_cache(connection)
+    cache.clear()
+    FooModel.objects.create(name="1", json_field={"foo": "bar"})
+    FooModel.objects.create(name="2", json_field={"foo": "bar"})
+
+    assert [item.name for item in FooModel.objects.filter(name="1")] == ["1"]
+    assert [item.name for item in FooModel.objects.filter(name="2")] == ["2"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    qs = FooModel.objects.filter(name__in=["1", "2"], int_field__isnull=False).order_by("-name")
+    assert [item.name for item in qs] == ["2", "1"]
+    assert [item.name for item in qs.exclude(name="2")] == ["1"]
+    assert cache.misses == 3
+    # bounded, least recently used shapes are evicted
+    assert len(cache) == 2
+
+    operation = FooModel.objects.filter(name="3").query.get_compiler("mongodb").as_operation()
+    assert operation["filter"] == {"$and": [{"name": {"$eq": "3"}}]}
+    assert cache.hits == 1
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_find_operation_matches_aggregate(monkeypatch):
+    for i in range(5):
+        FooModel.objects.create(name=str(i), nested_field=f"nested-{i}", json_field={"foo": i})
+
+    querysets = [
+        lambda: list(FooModel.objects.all()),
+        lambda: list(FooModel.objects.filter(name__in=["1", "3"]).order_by("-name")),
+        lambda: list(FooModel.objects.order_by("name")[1:3]),
+        lambda: list(FooModel.objects.order_by("name").values_list("name", "nested_field")),
+        lambda: FooModel.objects.order_by("-name").first(),
+        lambda: FooModel.objects.get(name="2"),
+        lambda: FooModel.objects.filter(name="2").exists(),
+    ]
+    results = [queryset() for queryset in querysets]
+
+    operation = FooModel.objects.order_by("name")[1:3].query.get_compiler("mongodb").as_operation()
+    assert operation["op"] == "find"
+    assert (operation["skip"], operation["limit"]) == (1, 2)
+    operation = FooModel.objects.all()[:1].query.get_compiler("mongodb").as_operation()
+    assert operation["op"] == "find_one"
+
+    monkeypatch.setattr(SQLCompiler, "get_find_operation", lambda *args: None)
+    assert [queryset() for queryset in querysets] == results
+
+
+def _aggregates(field):
+    return {
+        "total": Sum(field),
+        "average": Avg(field),
+        "minimum": Min(field),
+        "maximum": Max(field),
+        "std_dev": StdDev(field),
+        "std_dev_sample": StdDev(field, sample=True),
+        "variance": Variance(field, sample=True),
+        "count": Count(field),
+        "distinct_total": Sum(field, distinct=True),
+        "distinct_count": Count(field, distinct=True),
+        "filtered_total": Sum(field, filter=Q(**{f"{field}__gt": 1}) & ~Q(name="e")),
+        "filtered_count": Count("pk", filter=Q(name__in=["a", "b"])),
+        "empty_total": Sum(field, filter=Q(**{f"{field}__gt": 100}), default=0),
+    }
+
+
+@pytest.mark.django_db(databases=["mongodb", "default"])
+def test_server_side_aggregates():
+    for name, value in zip("abcde", [1, 2, 2, 5, 10], strict=True):
+        FooModel.objects.create(name=name, int_field=value, json_field={})
+        RefModel.objects.create(name=name, value=value, json={})
+
+    result = FooModel.objects.aggregate(**_aggregates("int_field"))
+    expected = RefModel.objects.aggregate(**_aggregates("value"))
+    assert result == pytest.approx(expected)
+
+    assert FooModel.objects.filter(name="none").aggregate(Sum("int_field"), Count("pk")) == {
+        "int_field__sum": None,
+        "pk__count": 0,
+    }
+
+    # null and missing values don't match comparisons, as in SQL
+    FooModel.objects.filter(name__in=["a", "b"]).update(name2="m")
+    assert FooModel.objects.aggregate(
+        lt=Count("pk", filter=Q(name2__lt="z")),
+        lte=Count("pk", filter=Q(name2__lte="m")),
+    ) == {"lt": 2, "lte": 2}
+    assert query_to_expression({"name_2": {"$lt": "z"}}) == {
+        "$and": [{"$lt": ["$name_2", "z"]}, {"$gt": ["$name_2", None]}]
+    }
+
+
+@pytest.mark.django_db(databases=["mongodb", "default"])
+def test_group_by():
+    rows = [
+        ("a", "x", 1),
+        ("a", "x", 2),
+        ("a", "y", 3),
+        ("b", "x", 4),
+        ("c", "x", 5),
+        ("c", "y", 6),
+    ]
+    for name, name2, value in rows:
+        FooModel.objects.create(name=name, name2=name2, int_field=value, json_field={})
+        RefModel.objects.create(name=name, value=value, json={})
+
+    def grouped(qs, field):
+        return list(
+            qs.values("name")
+            .annotate(count=Count("pk"), total=Sum(field))
+            .filter(count__gt=1)
+            .order_by("-total")
+        )
+
+    assert grouped(FooModel.objects.all(), "int_field") == grouped(RefModel.objects.all(), "value")
+
+    compound = (
+        FooModel.objects.filter(int_field__gt=1)
+        .values("name", "name2")
+        .annotate(total=Sum("int_field"))
+        .order_by("name", "name2")
+    )
+    assert list(compound.values_list("name", "name2", "total")) == [
+        ("a", "x", 2),
+        ("a", "y", 3),
+        ("b", "x", 4),
+        ("c", "x", 5),
+        ("c", "y", 6),
+    ]
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_count_joined_rows():
+    RelatedModel.objects.all().delete()
+    foo = FooModel.objects.create(name="parent", json_field={})
+    FooModel.objects.create(name="childless", json_field={})
+    RelatedModel.objects.create(name="a", foo=foo)
+    RelatedModel.objects.create(name="b", foo=foo)
+
+    queryset = FooModel.objects.annotate(count=Count("related")).order_by("name")
+    assert list(queryset.values_list("name", "count")) == [("childless", 0), ("parent", 2)]
+    # rows of the queried collection are counted without checking their primary key
+    queryset = FooModel.objects.values("name").annotate(count=Count("pk"))
+    operation = queryset.query.get_compiler("mongodb").as_operation()
+    [group] = [stage["$group"] for stage in operation["pipeline"] if "$group" in stage]
+    assert group["__count"] == {"$sum": 1}
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_group_by_joined_column():
+    for name, extra in [("a", "x"), ("a", "y"), ("b", "z")]:
+        foo = FooModel.objects.create(name=name, json_field={})
+        DifferentTableOneToOne.objects.create(dummy_model=foo, extra=extra)
+    FooModel.objects.create(name="c", json_field={})
+
+    queryset = FooModel.objects.values("name").annotate(extra=Max("another_extends__extra"))
+    operation = queryset.query.get_compiler("mongodb").as_operation()
+    [group] = [stage["$group"] for stage in operation["pipeline"] if "$group" in stage]
+    assert group["__extra"] == {"$max": "$testapp_differenttableonetoone.extra"}
+    assert list(queryset.order_by("name")) == [
+        {"name": "a", "extra": "y"},
+        {"name": "b", "extra": "z"},
+        {"name": "c", "extra": None},
+    ]
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_select_related():
+    RelatedModel.objects.all().delete()
+    foo = FooModel.objects.create(name="foo", json_field={})
+    RelatedModel.objects.create(name="related", foo=foo)
+
+    queryset = RelatedModel.objects.select_related("foo")
+    operation = queryset.query.get_compiler("mongodb").as_operation()
+    assert operation["op"] == "aggregate"
+    assert {"$unwind": {"path": "$testapp_foomodel", "preserveNullAndEmptyArrays": False}} in (
+        operation["pipeline"]
+    )
+
+    [related] = queryset
+    # joined columns with the same attname are not mixed up
+    assert (related.name, related.foo.name) == ("related", "foo")
+    assert related.foo.pk == foo.pk
+
+    child = SameTableChild.objects.create(name="child", json_field={}, extended="extra")
+    operation = SameTableChild.objects.all().query.get_compiler("mongodb").as_operation()
+    assert not any("$lookup" in stage for stage in operation.get("pipeline", []))
+    child = SameTableChild.objects.select_related("dummy_model_ptr").get(pk=child.pk)
+    assert (child.name, child.extended) == ("child", "extra")
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_filter_across_relations():
+    RelatedModel.objects.all().delete()
+    foo1 = FooModel.objects.create(name="foo1", json_field={})
+    foo2 = FooModel.objects.create(name="foo2", json_field={})
+    RelatedModel.objects.create(name="a", foo=foo1)
+    RelatedModel.objects.create(name="b", foo=foo1)
+    RelatedModel.objects.create(name="a", foo=foo2)
+
+    # unfiltered queried collection, the matching keys are semi-joined when it's executed
+    queryset = RelatedModel.objects.filter(foo__name="foo1").order_by("name")
+    compiler = queryset.query.get_compiler("mongodb")
+    assert "$lookup" in compiler.as_operation()["pipeline"][0]
+    assert compiler.get_operation()["filter"] == {"foo_id": {"$in": [foo1.pk]}}
+    assert [related.name for related in queryset] == ["a", "b"]
+
+    # filtered queried collection, the joined collection is filtered by the $lookup
+    queryset = RelatedModel.objects.filter(name="a", foo__name="foo2")
+    operation = queryset.query.get_compiler("mongodb").as_operation()
+    [lookup] = [stage["$lookup"] for stage in operation["pipeline"] if "$lookup" in stage]
+    assert lookup["pipeline"] == [{"$match": {"$and": [{"name": {"$eq": "foo2"}}]}}]
+    assert [related.foo_id for related in queryset] == [foo2.pk]
+
+    assert list(
+        RelatedModel.objects.filter(Q(name="b") | Q(foo__name="foo2"))
+        .order_by("name")
+        .values_list("name", flat=True)
+    ) == ["a", "b"]
+    assert list(FooModel.objects.filter(related__name="b")) == [foo1]
+    assert not RelatedModel.objects.filter(foo__name="missing").exists()
+
+    FooModel.objects.filter(related__name="b").delete()
+    assert list(RelatedModel.objects.values_list("name", flat=True)) == ["a"]
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_subqueries():
+    RelatedModel.objects.all().delete()
+    foo1 = FooModel.objects.create(name="foo1", int_field=1, json_field={})
+    foo2 = FooModel.objects.create(name="foo2", int_field=2, json_field={})
+    foo3 = FooModel.objects.create(name="foo3", int_field=3, json_field={})
+    RelatedModel.objects.create(name="a", foo=foo1)
+    RelatedModel.objects.create(name="b", foo=foo2)
+
+    related = RelatedModel.objects.filter(foo=OuterRef("pk"))
+    queryset = FooModel.objects.filter(Exists(related)).order_by("name")
+    operation = queryset.query.get_compiler("mongodb").as_operation()
+    # computed in a single operation
+    assert operation["op"] == "aggregate"
+    assert list(queryset) == [foo1, foo2]
+    assert list(FooModel.objects.filter(~Exists(related))) == [foo3]
+    assert list(FooModel.objects.exclude(Exists(related.filter(name="a"))).order_by("name")) == [
+        foo2,
+        foo3,
+    ]
+
+    foo_ids = RelatedModel.objects.filter(name="b").values("foo_id")
+    assert list(FooModel.objects.filter(id__in=Subquery(foo_ids))) == [foo2]
+    assert list(FooModel.objects.filter(id__in=foo_ids)) == [foo2]
+    # nested subqueries
+    nested = RelatedModel.objects.filter(foo__in=FooModel.objects.filter(int_field__gt=1))
+    assert list(FooModel.objects.filter(id__in=nested.values("foo_id"))) == [foo2]
+    assert list(
+        FooModel.objects.filter(Exists(nested.filter(foo=OuterRef("pk"))), int_field__lt=3)
+    ) == [foo2]
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_bulk_create_returns_pks():
+    objs = FooModel.objects.bulk_create(
+        [FooModel(name=f"bulk{i}", json_field={}) for i in range(3)]
+    )
+    assert all(isinstance(obj.pk, ObjectId) for obj in objs)
+    assert len({obj.pk for obj in objs}) == 3
+    assert [FooModel.objects.get(pk=obj.pk).name for obj in objs] == ["bulk0", "bulk1", "bulk2"]
+
+    query = models.sql.InsertQuery(FooModel)
+    query.insert_values(
+        [FooModel._meta.get_field("name")], [FooModel(name="a"), FooModel(name="b")]
+    )
+    compiler = query.get_compiler("mongodb")
+    compiler.returning_fields = [FooModel._meta.pk]
+    operation = compiler.as_operation()
+    assert operation["op"] == "insert_many"
+    assert [document["_id"] for document in operation["documents"]] == compiler.inserted_pks
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_bulk_update():
+    objs = FooModel.objects.bulk_create(
+        [FooModel(name=f"update{i}", int_field=i, json_field={}) for i in range(5)]
+    )
+    for obj in objs:
+        obj.int_field += 10
+    objs[0].name = "renamed"
+
+    result = FooModel.objects.bulk_update(objs, ["name", "int_field"], batch_size=2)
+    assert result == 5
+    assert (result.matched_count, result.modified_count) == (5, 5)
+    assert list(FooModel.objects.order_by("int_field").values_list("name", "int_field")) == [
+        ("renamed", 10),
+        ("update1", 11),
+        ("update2", 12),
+        ("update3", 13),
+        ("update4", 14),
+    ]
+
+    result = FooModel.objects.bulk_update(objs, ["int_field"], ordered=False)
+    assert (result.matched_count, result.modified_count) == (5, 0)
+    with pytest.raises(ValueError):
+        FooModel.objects.bulk_update(objs, ["id"])
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_expression_updates():
+    foo = FooModel.objects.create(name="foo", int_field=5, json_field={})
+    queryset = FooModel.objects.filter(pk=foo.pk)
+
+    def update_operation(**values):
+        query = queryset.query.chain(models.sql.UpdateQuery)
+        query.add_update_values(values)
+        return query.get_compiler("mongodb").as_operation()["update"]
+
+    assert update_operation(int_field=F("int_field") + 2, name="bar") == {
+        "$inc": {"int_field": 2},
+        "$set": {"name": "bar"},
+    }
+    assert update_operation(int_field=Greatest("int_field", 10)) == {"$max": {"int_field": 10}}
+    # expressions without update operator are applied by a pipeline update
+    assert isinstance(update_operation(name=Concat("name", models.Value("!"))), list)
+
+    queryset.update(int_field=F("int_field") + 2)
+    queryset.update(int_field=F("int_field") * 3)
+    queryset.update(int_field=F("int_field") - 1)
+    queryset.update(int_field=Least("int_field", 15))
+    assert FooModel.objects.get(pk=foo.pk).int_field == 15
+
+    queryset.update(
+        name=Concat("name", models.Value("-"), Coalesce("name2", models.Value("none"))),
+        int_field=Case(When(int_field__gt=10, then=F("int_field") / 2), default=models.Value(0)),
+    )
+    foo.refresh_from_db()
+    assert (foo.name, foo.int_field) == ("foo-none", 7)
+
+    # constants, which aren't values of the field, are applied by a pipeline update
+    assert isinstance(update_operation(int_field=F("int_field") * 1.5), list)
+    assert isinstance(update_operation(int_field=F("int_field") + 0.5), list)
+    queryset.update(int_field=F("int_field") * 1.4)
+    queryset.update(datetime_field=F("datetime_field") + timedelta(days=1, milliseconds=1))
+    updated = FooModel.objects.get(pk=foo.pk)
+    assert updated.int_field == 10
+    assert updated.datetime_field == foo.datetime_field + timedelta(days=1, milliseconds=1)
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_dirty_fields_save(monkeypatch):
+    DirtyFieldsModel.objects.all().delete()
+    obj = DirtyFieldsModel.objects.create(name="dirty", payload={"items": [1, 2]})
+    assert obj.get_dirty_fields() == []
+
+    operations = []
+    execute = SQLUpdateCompiler.execute_sql
+
+    def spy_update(self, *args, **kwargs):
+        operations.append(self.as_operation())
+        return execute(self, *args, **kwargs)
+
+    monkeypatch.setattr(SQLUpdateCompiler, "execute_sql", spy_update)
+
+    obj = DirtyFieldsModel.objects.get(pk=obj.pk)
+    obj.save()
+    assert operations == []
+
+    obj.payload["items"].append(3)
+    obj.counter = 1
+    assert obj.get_dirty_fields() == ["counter", "payload"]
+    updated_at = obj.updated_at
+    obj.save()
+    [operation] = operations
+    assert operation["update"] == {
+        "$set": {"counter": 1, "payload": {"items": [1, 2, 3]}, "updated_at": obj.updated_at}
+    }
+    assert obj.updated_at > updated_at
+    assert obj.get_dirty_fields() == []
+
+    obj = DirtyFieldsModel.objects.only("name").get(pk=obj.pk)
+    obj.name = "changed"
+    assert obj.counter == 1  # loads the deferred field
+    assert obj.get_dirty_fields() == ["name"]
+    obj.save()
+    assert DirtyFieldsModel.objects.get(pk=obj.pk).name == "changed"
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_json_key_paths():
+    FooModel.objects.create(name="dhl", json_field={"carrier": {"code": "dhl", "weight": 5}})
+    FooModel.objects.create(name="ups", json_field={"carrier": {"code": "ups", "weight": 10}})
+    FooModel.objects.create(name="none", json_field={})
+
+    queryset = FooModel.objects.filter(json_field__carrier__code="dhl")
+    operation = queryset.query.get_compiler("mongodb").as_operation()
+    assert operation["filter"] == {"$and": [{"json_field.carrier.code": {"$eq": "dhl"}}]}
+    assert [foo.name for foo in queryset] == ["dhl"]
+
+    def names(**lookups):
+        return sorted(FooModel.objects.filter(**lookups).values_list("name", flat=True))
+
+    assert names(json_field__carrier__weight__gt=5) == ["ups"]
+    assert names(json_field__carrier__code__in=["dhl", "ups"]) == ["dhl", "ups"]
+    assert names(json_field__carrier__isnull=True) == ["none"]
+    assert names(json_field__has_key="carrier") == ["dhl", "ups"]
+
+    queryset = FooModel.objects.filter(json_field__carrier__code="dhl")
+    assert len(queryset) == 1
+    updated = queryset.update_json(
+        "json_field",
+        values={"carrier__code": "dhl-express", "tracked": True},
+        unset=["carrier__weight"],
+    )
+    assert updated == 1
+    assert FooModel.objects.get(name="dhl").json_field == {
+        "carrier": {"code": "dhl-express"},
+        "tracked": True,
+    }
+    # the cached rows are read again
+    assert len(queryset) == 0
+
+    assert FooModel.objects.update_json("json_field") == 0
+    with pytest.raises(TypeError, match="slice"):
+        FooModel.objects.all()[:1].update_json("json_field", unset=["tracked"])
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_upsert_save(mongo_commands):
+    obj = UpsertModel(pk=ObjectId(), name="new")
+    obj.save()
+    assert [command["op"] for command in mongo_commands] == ["update_one"]
+    assert not obj._state.adding
+    assert UpsertModel.objects.get(pk=obj.pk).name == "new"
+
+    child = UpsertChild.objects.create(name="parent", extended="child")
+    mongo_commands.clear()
+    child.name = "changed"
+    child.extended = "changed"
+    child.save()
+    assert len(mongo_commands) == 1
+    assert mongo_commands[0]["update"] == {
+        "$set": {
+            "name": "changed",
+            "counter": 0,
+            "foo_id": None,
+            "created": child.created,
+            "extended": "changed",
+        }
+    }
+    child = UpsertChild.objects.get(pk=child.pk)
+    assert (child.name, child.extended) == ("changed", "changed")
+
+    mongo_commands.clear()
+    child.counter = 2
+    child.save(update_fields=["counter"])
+    assert mongo_commands[0]["update"] == {"$set": {"counter": 2}}
+    assert mongo_commands[0]["upsert"] is False
+    foo = FooModel.objects.create(name="foo", json_field={})
+    mongo_commands.clear()
+    child.foo_id = foo.pk
+    child.save(update_fields=["foo_id"])
+    assert mongo_commands[0]["update"] == {"$set": {"foo_id": foo.pk}}
+    with pytest.raises(ValueError, match="missing"):
+        child.save_base(update_fields=["missing"])
+    UpsertModel.objects.filter(pk=child.pk).delete()
+    with pytest.raises(DatabaseError):
+        child.save(update_fields=["counter"])
+
+    # a new instance with the key of a stored document doesn't overwrite its auto_now_add value
+    created = UpsertModel.objects.get(pk=obj.pk).created
+    mongo_commands.clear()
+    UpsertModel(pk=obj.pk, name="replaced").save()
+    assert mongo_commands[0]["update"]["$setOnInsert"].keys() == {"created"}
+    replaced = UpsertModel.objects.get(pk=obj.pk)
+    assert (replaced.name, replaced.created) == ("replaced", created)
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_upsert_save_parent_link(mongo_commands):
+    pk = ObjectId()
+    child = UpsertChild(id=pk, name="parent", extended="child")
+    child.save()
+    assert [command["op"] for command in mongo_commands] == ["update_one"]
+    assert child.upsert_model_ptr_id == pk
+
+    pk = ObjectId()
+    child = UpsertChild(upsert_model_ptr_id=pk, name="parent", extended="child")
+    child.save()
+    assert child.id == pk
+    child = UpsertChild.objects.get(pk=pk)
+    assert (child.id, child.upsert_model_ptr_id, child.extended) == (pk, pk, "child")
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_update_or_create_single_round_trip(mongo_commands):
+    UpsertModel.objects.all().delete()
+    mongo_commands.clear()
+
+    obj, created = UpsertModel.objects.get_or_create(name="upsert", defaults={"counter": 1})
+    assert created
+    assert (obj.name, obj.counter) == ("upsert", 1)
+    assert [command["op"] for command in mongo_commands] == ["find_one_and_update"]
+
+    same, created = UpsertModel.objects.get_or_create(name="upsert", defaults={"counter": 2})
+    assert not created
+    assert (same.pk, same.counter) == (obj.pk, 1)
+
+    updated, created = UpsertModel.objects.update_or_create(name="upsert", defaults={"counter": 3})
+    assert not created
+    assert (updated.pk, updated.counter) == (obj.pk, 3)
+    assert mongo_commands[-1]["update"]["$set"] == {"counter": 3}
+    assert len(mongo_commands) == 3
+
+    # the document is read by column, e.g. name2 is stored as name_2
+    foo, created = FooModel.objects.get_or_create(
+        name="upsert", defaults={"name2": "second", "nested_field": "nested", "json_field": {}}
+    )
+    assert created
+    assert (foo.name2, foo.nested_field) == ("second", "nested")
+    assert FooModel.objects.get_or_create(name="upsert") == (foo, False)
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_concurrent_get_or_create():
+    from concurrent.futures import ThreadPoolExecutor
+
+    UpsertModel.objects.all().delete()
+    collection = connections["mongodb"].cursor().connection["testapp_upsertmodel"]
+    collection.create_index("name", unique=True)
+    names = [f"name-{i % 10}" for i in range(200)]
+
+    def get_or_create(name):
+        try:
+            obj, _ = UpsertModel.objects.get_or_create(name=name)
+            return name, obj.pk
+        finally:
+            connections.close_all()
+
+    try:
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(get_or_create, names))
+    finally:
+        collection.drop_index("name_1")
+
+    assert UpsertModel.objects.count() == 10
+    pks = {}
+    for name, pk in results:
+        assert pks.setdefault(name, pk) == pk
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_count_and_exists_operations(mongo_commands):
+    for i in range(3):
+        FooModel.objects.create(name=str(i), json_field={})
+    mongo_commands.clear()
+
+    assert FooModel.objects.filter(name__in=["0", "1"]).count() == 2
+    assert mongo_commands[-1]["pipeline"][-1] == {"$count": "__count"}
+    assert FooModel.objects.filter(name="missing").count() == 0
+
+    assert FooModel.objects.allow_estimated_count().count() == 3
+    assert mongo_commands[-1]["op"] == "estimated_document_count"
+    assert FooModel.objects.allow_estimated_count().filter(name="0").count() == 1
+    assert mongo_commands[-1]["op"] == "aggregate"
+
+    assert FooModel.objects.filter(name="1").exists()
+    assert (mongo_commands[-1]["op"], mongo_commands[-1]["projection"]) == ("find_one", {"_id": 1})
+    assert not FooModel.objects.filter(name="missing").exists()
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_seek_pagination():
+    for i in range(30):
+        FooModel.objects.create(name=f"{i:02}", int_field=i % 4, json_field={})
+    queryset = FooModel.objects.filter(int_field__lt=3)
+    expected = list(queryset.order_by("-int_field", "name", "id").values_list("name", flat=True))
+
+    paginator = SeekPaginator(queryset, 5, order_by=("-int_field", "name"))
+    names = []
+    page = paginator.page()
+    while True:
+        names.extend(foo.name for foo in page)
+        if not page.has_next():
+            break
+        page = paginator.page(page.next_page_number())
+    assert names == expected
+
+    token = page.number
+    operation = queryset.seek(after=token, order_by=("-int_field", "name"))[:5]
+    operation = operation.query.get_compiler("mongodb").as_operation()
+    assert "skip" not in operation
+    staged = queryset.add_aggregation_stage({"$match": {"int_field": {"$lt": 3}}})
+    assert [foo.name for foo in staged.seek(after=token, order_by=("-int_field", "name"))] == [
+        foo.name for foo in page
+    ]
+    with pytest.raises(InvalidPage):
+        queryset.seek(after=token, order_by=("name",))
+    assert [foo.name for foo in paginator.get_page("invalid")] == expected[:5]
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_seek_deep_offset():
+    FooModel.objects.bulk_create(
+        [FooModel(name=f"{i:05}", json_field={}) for i in range(500)], batch_size=100
+    )
+    offset = 400
+    skipped = [foo.name for foo in FooModel.objects.order_by("name", "id")[offset : offset + 20]]
+
+    last = FooModel.objects.order_by("name", "id")[offset - 1]
+    token = FooModel.objects.seek(order_by=("name",)).get_seek_token(last)
+    queryset = FooModel.objects.seek(after=token, order_by=("name",))[:20]
+    # the rows are seeked by a range on the sort keys, not skipped
+    operation = queryset.query.get_compiler("mongodb").as_operation()
+    assert "skip" not in operation
+    assert {"name": {"$gte": last.name}} in operation["filter"]["$and"]
+    assert [foo.name for foo in queryset] == skipped
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_facet_pagination(mongo_commands):
+    for i in range(23):
+        FooModel.objects.create(name=f"{i:02}", int_field=i % 2, json_field={})
+    mongo_commands.clear()
+
+    page = FooModel.objects.order_by("name").page(3, 10)
+    assert [foo.name for foo in page] == ["20", "21", "22"]
+    assert (page.paginator.count, page.paginator.num_pages) == (23, 3)
+    assert len(mongo_commands) == 1
+    assert "$facet" in mongo_commands[0]["pipeline"][-1]
+
+    paginator = FacetPaginator(FooModel.objects.filter(int_field=0).order_by("-name"), 5)
+    page = paginator.page(1)
+    assert [foo.name for foo in page] == ["22", "20", "18", "16", "14"]
+    assert paginator.count == 12
+    values_page = FacetPaginator(
+        FooModel.objects.filter(int_field=0).order_by("name").values_list("name", flat=True), 5
+    ).page(3)
+    assert list(values_page) == ["20", "22"]
+    with pytest.raises(EmptyPage):
+        paginator.page(4)
+    assert list(FacetPaginator(FooModel.objects.filter(name="missing"), 5).page(1)) == []
+
+    search_qs = FooModel.objects.annotate(search=SearchVector("name")).filter(
+        search=SearchQuery("test")
+    )[:5]
+    search_qs.query.with_total = True
+    operation = search_qs.query.get_compiler("mongodb").as_operation()
+    search, facet = operation["pipeline"]
+    assert search["$search"]["count"] == {"type": "total"}
+    assert facet["$facet"]["total"][0] == {"$replaceWith": "$$SEARCH_META"}
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_search_filter_pushdown():
+    def stages(queryset):
+        return queryset.query.get_compiler("mongodb").as_operation()["pipeline"]
+
+    queryset = FooModel.objects.prefer_search().filter(
+        name="test", int_field__gte=2, nested_field="nested"
+    )
+    search, match, *_ = stages(queryset)
+    assert search["$search"] == {
+        "compound": {
+            "must": [{"text": {"path": "name", "query": "test"}}],
+            "filter": [{"range": {"path": "int_field", "gte": 2}}],
+        }
+    }
+    assert match["$match"] == {"$and": [{"nested.field": {"$eq": "nested"}}]}
+
+    queryset = FooModel.objects.prefer_search().filter(int_field__in=[1, 2])
+    search, *rest = stages(queryset)
+    assert search["$search"] == {
+        "compound": {"filter": [{"in": {"path": "int_field", "value": [1, 2]}}]}
+    }
+    assert not any("$match" in stage for stage in rest)
+
+    # disjunctions with unsearchable lookups and negations are matched entirely
+    queryset = FooModel.objects.prefer_search().filter(
+        Q(int_field=1) | Q(nested_field="nested"), ~Q(int_field=3)
+    )
+    # without a $search stage, the query is executed with find
+    operation = queryset.query.get_compiler("mongodb").as_operation()
+    assert operation["op"] == "find"
+    assert operation["filter"] == {
+        "$and": [
+            {"$or": [{"int_field": {"$eq": 1}}, {"nested.field": {"$eq": "nested"}}]},
+            {"$nor": [{"int_field": {"$eq": 3}}]},
+        ]
+    }
+
+
+@pytest.mark.skipif(os.environ.get("CI") == "true", reason="CI does not have mongodb search")
+@pytest.mark.django_db(databases=["mongodb"])
+def test_search_filter_pushdown_results(search_index):
+    for i in range(50):
+        FooModel.objects.create(name="test", int_field=i, json_field={})
+    # search index needs to sync
+    time.sleep(2)
+    queryset = FooModel.objects.prefer_search().filter(name="test", int_field__gte=45)
+    operation = queryset.query.get_compiler("mongodb").as_operation()
+    # only the 5 matching documents are returned by the search, none is filtered by a $match
+    assert not any("$match" in stage for stage in operation["pipeline"])
+    assert sorted(foo.int_field for foo in queryset) == [45, 46, 47, 48, 49]
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_search_score_and_stored_source():
+    def stages(queryset):
+        return queryset.query.get_compiler("mongodb").as_operation()["pipeline"]
+
+    queryset = FooModel.objects.search(score="score").filter(name="test").order_by("-score", "name")
+    search, project = stages(queryset)
+    assert search["$search"]["sort"] == {
+        "score": {"$meta": "searchScore", "order": -1},
+        "name": 1,
+    }
+    assert project["$project"]["score"] == {"$meta": "searchScore"}
+    assert "returnStoredSource" not in search["$search"]
+
+    queryset = FooModel.objects.order_by("name").search(order_by_score=True, stored_source=True)
+    search, project = stages(queryset.filter(name="test").values("name", "name2"))
+    assert "sort" not in search["$search"]
+    assert search["$search"]["returnStoredSource"] is True
+    # int_field isn't stored in the search index, the documents are read from the collection
+    search, project = stages(queryset.filter(name="test").values("name", "int_field"))
+    assert "returnStoredSource" not in search["$search"]
+    # the filter of the unindexed datetime_field is matched after the search
+    search, match, project = stages(
+        queryset.filter(name="test", datetime_field__isnull=False).values("name")
+    )
+    assert "returnStoredSource" not in search["$search"]
+    # the documents are sorted by the unstored int_field
+    search, project = stages(queryset.filter(name="test").order_by("int_field").values("name"))
+    assert "returnStoredSource" not in search["$search"]
+    search, project = stages(queryset.filter(name="test").order_by("-name2").values("name"))
+    assert search["$search"]["returnStoredSource"] is True
+
+    # without a searched filter there is no $search stage, which would score the documents
+    with pytest.raises(NotImplementedError, match="search score"):
+        stages(FooModel.objects.search(score="score"))
+    with pytest.raises(NotImplementedError, match="search score"):
+        stages(FooModel.objects.search(score="score").filter(datetime_field__isnull=False))
+
+
+@pytest.mark.skipif(os.environ.get("CI") == "true", reason="CI does not have mongodb search")
+@pytest.mark.django_db(databases=["mongodb"])
+def test_search_score_results(search_index):
+    FooModel.objects.create(name="test", json_field={})
+    FooModel.objects.create(name="other", json_field={})
+    # search index needs to sync
+    time.sleep(2)
+    [foo] = FooModel.objects.search(score="score", order_by_score=True).filter(name="test")
+    assert foo.score > 0
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_text_search_fallback():
+    TextSearchModel.objects.all().delete()
+    with connections["mongodb"].schema_editor() as editor:
+        editor.create_text_index(TextSearchModel)
+    collection = connections["mongodb"].cursor().connection["testapp_textsearchmodel"]
+    index = collection.index_information()["testapp_textsearchmodel_text"]
+    assert (index["weights"], index["default_language"]) == ({"title": 10, "body": 4}, "english")
+
+    TextSearchModel.objects.create(title="mongodb backend", body="django")
+    TextSearchModel.objects.create(title="django", body="a mongodb backend for django")
+    TextSearchModel.objects.create(title="postgres", body="sql")
+    queryset = (
+        TextSearchModel.objects.annotate(search=SearchVector("title", "body"))
+        .filter(search=SearchQuery("mongodb"))
+        .search(score="score", order_by_score=True)
+    )
+    operation = queryset.query.get_compiler("mongodb").as_operation()
+    assert operation["filter"] == {"$and": [{"$text": {"$search": "mongodb"}}]}
+    assert operation["sort"] == [("score", {"$meta": "textScore"})]
+
+    results = list(queryset)
+    assert [text.title for text in results] == ["mongodb backend", "django"]
+    assert results[0].score > results[1].score
+
+    phrase = TextSearchModel.objects.annotate(search=SearchVector("title", "body")).filter(
+        search=SearchQuery("mongodb backend", search_type="phrase")
+    )
+    assert sorted(text.title for text in phrase) == ["django", "mongodb backend"]
+
+
+@pytest.mark.django_db(databases=["mongodb"])
+def test_text_search_query():
+    def text_filter(query):
+        queryset = TextSearchModel.objects.annotate(search=SearchVector("title", "body"))
+        operation = queryset.filter(search=query).query.get_compiler("mongodb").as_operation()
+        [text] = operation["filter"]["$and"]
+        return text["$text"]
+
+    assert text_filter(SearchQuery("mongodb backend")) == {"$search": "mongodb backend"}
+    assert text_filter(SearchQuery("mongodb backend", search_type="phrase")) == {
+        "$search": '"mongodb backend"'
+    }
+    assert text_filter(SearchQuery("backend", config="french")) == {
+        "$search": "backend",
+        "$language": "french",
+    }
+
+    queryset = TextSearchModel.objects.annotate(search=SearchVector("title", "body"))
+    with pytest.raises(NotImplementedError, match="Negated"):
+        queryset.exclude(search=SearchQuery("mongodb")).query.get_compiler("mongodb").as_operation()
+
+    queryset = queryset.filter(search=SearchQuery("mongodb")).search(score="score")
+    operation = queryset.order_by("-score").query.get_compiler("mongodb").as_operation()
+    assert operation["sort"] == [("score", {"$meta": "textScore"})]
+    with pytest.raises(NotImplementedError, match="descending score"):
+        queryset.order_by("score").query.get_compiler("mongodb").as_operation()
@@ -1,10 +1,11 @@
 from decimal import Decimal
 
+from django.contrib.postgres.search import SearchVector
 from django.db import models
 from django.db.models import JSONField
 
 from django_mongodb.managers import MongoManager
-from django_mongodb.models import DecimalField
+from django_mongodb.models import DecimalField, DirtyFieldsMixin, UpsertSaveMixin
 
 
 class FooModel(models.Model):
@@ -21,7 +22,8 @@ class FooModel(models.Model):
     nested_field = models.CharField(db_column="nested.field", max_length=100)
 
     class MongoMeta:
-        search_fields = {"name": ["string"], "name2": ["string"]}
+        search_fields = {"name": ["string"], "name2": ["string"], "int_field": ["number"]}
+        search_stored_fields = ["name", "name2"]
 
 
 class SameTableChild(FooModel):
@@ -74,3 +76,46 @@ class DecimalFieldModel(models.Model):
         decimal_places=2,
         max_digits=10,
     )
+
+
+class DirtyFieldsModel(DirtyFieldsMixin, models.Model):
+    name = models.CharField(max_length=100)
+    counter = models.IntegerField(default=0)
+    payload = JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class UpsertModel(UpsertSaveMixin, models.Model):
+    objects: MongoManager = MongoManager()
+
+    name = models.CharField(max_length=100)
+    counter = models.IntegerField(default=0)
+    foo = models.ForeignKey(FooModel, null=True, on_delete=models.DO_NOTHING, related_name="+")
+    created = models.DateTimeField(auto_now_add=True)
+
+
+class UpsertChild(UpsertModel):
+    objects: MongoManager = MongoManager()
+
+    upsert_model_ptr = models.OneToOneField(
+        UpsertModel,
+        on_delete=models.CASCADE,
+        parent_link=True,
+        db_column="_id",
+    )
+    extended = models.CharField(max_length=100)
+
+    class Meta:
+        db_table = "testapp_upsertmodel"
+
+
+class TextSearchModel(models.Model):
+    objects: MongoManager = MongoManager()
+
+    title = models.CharField(max_length=100)
+    body = models.TextField()
+
+    class MongoMeta:
+        text_search_vector = SearchVector("title", weight="A", config="english") + SearchVector(
+            "body", weight="B"
+        )